@@ -0,0 +1,199 @@
+"""Scaling benchmarks for the execution modes in parcount.py.
+
+Sweeps the number of steps, the number of workers and the execution mode, for
+the I/O bound and CPU bound steps, or for a batch kernel, timing several trials
+of every configuration.  Each configuration is reported with the median and percentiles
+of its trial times, and with its speedup and parallel efficiency over the
+sequential mode at the same number of steps.  Results are printed as a table
+and can be written as JSON for tracking over time."""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import parcount
+
+
+MODES = ["sequential", "threaded", "multiproc", "pool", "asyncio", "hybrid"]
+
+
+def percentile(times, q):
+    """return the qth percentile of times, interpolating between trials"""
+    ordered = sorted(times)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def hybrid_shape(workers, threads):
+    """return (processes, threads per process) for a hybrid run of workers threads"""
+    threads = min(threads, workers)
+    return max(1, workers // threads), threads
+
+
+def time_mode(mode, workers, N, trials, schedule, hybrid_threads):
+    """time trials runs of mode and return (times, result, setup time).  The
+       pool is started once, outside the timed runs; its startup is the setup
+       time.  Every other mode pays its own startup costs in every trial."""
+    setup = 0.0
+    pool = None
+    if mode == "pool":
+        start = time.perf_counter()
+        pool = parcount.start_pool(workers)
+        setup = time.perf_counter() - start
+
+    times = []
+    result = None
+    try:
+        for trial in range(trials):
+            start = time.perf_counter()
+            if mode == "sequential":
+                result = parcount.run_sequential(N)
+            elif mode == "threaded" and schedule[0] == "static":
+                result = parcount.run_threaded(workers, N)
+            elif mode == "threaded":
+                result = parcount.run_threaded_scheduled(workers, N, *schedule)
+            elif mode == "multiproc" and schedule[0] == "static":
+                result = parcount.run_multiproc(workers, N)
+            elif mode == "multiproc":
+                result = parcount.run_multiproc_scheduled(workers, N, *schedule)
+            elif mode == "pool":
+                result = parcount.run_pool(pool, workers, N, *schedule)
+            elif mode == "asyncio":
+                result = parcount.run_asyncio(workers, N)
+            elif mode == "hybrid":
+                result = parcount.run_hybrid(*hybrid_shape(workers, hybrid_threads), N=N)
+            times.append(time.perf_counter() - start)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return times, result, setup
+
+
+def run_benchmarks(modes, step_counts, worker_counts, trials, workloads, schedule=("static", 1),
+                   hybrid_threads=4, out=sys.stdout):
+    """run every configuration, printing a row for each to out, and return the
+       list of result records.  A batch kernel replaces the step workloads, so
+       with one selected the rows are labelled by kernel and workloads is
+       ignored."""
+    if parcount.kernel is not None:
+        workloads = [None]
+    records = []
+    print("%-13s %-10s %9s %7s %10s %10s %10s %10s %8s %7s %9s"
+          % ("workload", "mode", "N", "workers", "median (s)", "p10 (s)", "p90 (s)", "setup (s)",
+             "speedup", "effic.", "result"), file=out)
+    for workload in workloads:
+        if workload is not None:
+            parcount.workload = workload
+        label = workload or "kernel:" + parcount.kernel
+        for N in step_counts:
+            baseline = None
+            for mode in modes:
+                # asyncio only has an I/O bound step, and no batch kernel
+                if mode == "asyncio" and (workload != "io" or parcount.kernel is not None):
+                    continue
+                for workers in ([1] if mode == "sequential" else worker_counts):
+                    if mode == "hybrid" and workers % min(hybrid_threads, workers) != 0:
+                        # hybrid would run fewer threads than workers, skewing the efficiency
+                        print("skipping hybrid with %i workers, not a multiple of %i threads per process"
+                              % (workers, hybrid_threads), file=sys.stderr)
+                        continue
+                    times, result, setup = time_mode(mode, workers, N, trials, schedule, hybrid_threads)
+                    median = statistics.median(times)
+                    if mode == "sequential":
+                        baseline = median
+                    speedup = baseline / median if baseline is not None and median > 0 else None
+                    record = {
+                        "workload": workload,
+                        "kernel": parcount.kernel,
+                        "mode": mode,
+                        "schedule": "%s:%i" % schedule if mode in ("threaded", "multiproc", "pool") else None,
+                        "N": N,
+                        "workers": workers,
+                        "trials": trials,
+                        "times": times,
+                        "median": median,
+                        "p10": percentile(times, 10),
+                        "p90": percentile(times, 90),
+                        "min": min(times),
+                        "max": max(times),
+                        "setup": setup,
+                        "speedup": speedup,
+                        "efficiency": speedup / workers if speedup is not None else None,
+                        "result": result,
+                    }
+                    if mode == "hybrid":
+                        record["processes"], record["threads"] = hybrid_shape(workers, hybrid_threads)
+                    records.append(record)
+                    print("%-13s %-10s %9i %7i %10.4f %10.4f %10.4f %10.4f %8s %7s %9i"
+                          % (label, mode, N, workers, median, record["p10"], record["p90"], setup,
+                             "-" if speedup is None else "%.2fx" % speedup,
+                             "-" if speedup is None else "%.0f%%" % (100 * record["efficiency"]),
+                             result), file=out)
+                    out.flush()
+    return records
+
+
+def environment():
+    """describe the machine the benchmarks ran on, for the JSON output"""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def int_list(text):
+    """argparse type for comma separated lists of integers"""
+    return [int(float(part)) for part in text.split(",")]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="benchmark parcount's execution modes")
+    parser.add_argument("-m", "--modes", default=",".join(MODES), type=lambda text: text.split(","),
+                        help="comma separated modes to run (default: all); speedups need sequential")
+    parser.add_argument("-N", "--steps", type=int_list, default=[100, 1000],
+                        help="comma separated step counts, e.g. 100,1e4,1e7 (default: 100,1000)")
+    parser.add_argument("-w", "--workers", type=int_list, default=[1, 2, 4, 8],
+                        help="comma separated worker counts (default: 1,2,4,8)")
+    parser.add_argument("-t", "--trials", type=int, default=5, help="timed trials per configuration")
+    parser.add_argument("--workload", action="append", choices=sorted(parcount.WORKLOADS),
+                        help="step workload to run (may be repeated; default: io and cpu)")
+    parser.add_argument("--kernel", help="batch kernel for the steps, instead of a workload: python, numpy or auto")
+    parser.add_argument("--schedule", default="static",
+                        help="schedule for threaded, multiproc and pool: static, dynamic[:chunk] or guided[:chunk]")
+    parser.add_argument("--hybrid-threads", type=int, default=4,
+                        help="threads per process in hybrid mode; workers / this many processes "
+                             "(larger worker counts that are not a multiple of it are skipped)")
+    parser.add_argument("-o", "--output", help="file to write the JSON results to")
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        if mode not in MODES:
+            parser.error("unknown mode %r (choose from %s)" % (mode, ", ".join(MODES)))
+    if args.kernel and args.workload:
+        parser.error("--workload and --kernel are exclusive")
+    try:
+        schedule = parcount.parse_schedule(args.schedule)
+        if args.kernel:
+            parcount.select_kernel(args.kernel)
+    except ValueError as e:
+        parser.error(str(e))
+    if parcount.kernel == "numpy":
+        parcount.check_kernels()
+
+    records = run_benchmarks(args.modes, args.steps, args.workers, args.trials,
+                             args.workload or ["io", "cpu"], schedule, args.hybrid_threads)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump({"environment": environment(), "results": records}, out, indent=2)
+            out.write("\n")
@@ -1,10 +1,28 @@
 """A simulation for experimenting with multiple threads and processes"""
 
-from threading import Thread, Semaphore
+from threading import Thread, Condition
+import asyncio
+import json
+import multiprocessing
+import queue
+import selectors
+import socket
+import socketserver
 import time
 import sys
 import random
-from subprocess import Popen
+from statistics import NormalDist
+from subprocess import Popen, PIPE
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 ################################################################################
@@ -23,22 +41,25 @@ def do_step(i):
     else:
         return 0
 
-    #### New CPU Bound Version #############
-    # for j in range(1000):
-    #     random.seed(i)
-    #     val = random.gauss(0, 2)
-    #
-    # random.seed(i)
-    # val = random.gauss(0, 2)
-    # if (val > 1):
-    #     return 1
-    # else:
-    #     return 0
-
 
+def do_step_cpu(i):
+    """simulates a task that requires a lot of processing and no I/O: do_step's
+       draw, repeated 1000 times.  It uses its own generator rather than the
+       shared one, so that threads running it concurrently cannot reseed each
+       other between a seed and its draw; Random(i).gauss gives the same
+       values as random.seed(i) followed by random.gauss."""
+    for j in range(1000):
+        val = random.Random(i).gauss(0, 2)
+    if (val > 1):
+        return 1
+    else:
+        return 0
 
 
+WORKLOADS = {"io": do_step, "cpu": do_step_cpu}
 
+# the name of the step do_range performs for each step: "io" or "cpu"
+workload = "io"
 
 
 def do_steps(k, n, N):
@@ -46,13 +67,158 @@ def do_steps(k, n, N):
        in the range [kN/n,(k+1)N/n)."""
     start = int(k * N / n)
     finish = int(min((k + 1) * N / n, N))
+    return do_range(start, finish)
+
 
+def do_range(start, finish):
+    """performs steps start through finish - 1 and returns the sum of their results"""
+    if kernel is not None:
+        return KERNELS[kernel](start, finish)
+    step = WORKLOADS[workload]
     value = 0
     for i in range(start, finish):
-        value += do_step(i)
+        value += step(i)
     return value
 
 
+################################################################################
+## batch kernels ###############################################################
+################################################################################
+
+# do_step reseeds the global generator for every step, so almost all of its
+# processing time is spent in Python-level RNG calls, and it cannot be
+# vectorized.  The batch kernels compute a whole range of steps at once with a
+# counter-based generator instead: step i hashes i with splitmix64, so its
+# result depends only on i, however the steps are divided up.
+#
+# A step counts when gauss(0, 2) > 1, which happens with probability
+# 1 - cdf(0.5) of a standard normal.  A step therefore counts when its 64 bit
+# hash, read as a uniform fraction, is at least cdf(0.5).  The results follow
+# the same distribution as do_step's, but are not the same draws.  The numpy
+# and python kernels give identical results.
+
+MASK64 = (1 << 64) - 1
+SPLITMIX_GAMMA = 0x9E3779B97F4A7C15
+SPLITMIX_MUL1 = 0xBF58476D1CE4E5B9
+SPLITMIX_MUL2 = 0x94D049BB133111EB
+KERNEL_THRESHOLD = int(NormalDist().cdf(0.5) * (1 << 64))
+
+# steps per numpy block, which bounds the kernel's memory use
+KERNEL_BLOCK = 1 << 20
+
+
+def python_kernel(start, finish):
+    """count the steps in [start, finish) whose hash clears KERNEL_THRESHOLD"""
+    value = 0
+    for i in range(start, finish):
+        z = ((i + 1) * SPLITMIX_GAMMA) & MASK64
+        z = ((z ^ (z >> 30)) * SPLITMIX_MUL1) & MASK64
+        z = ((z ^ (z >> 27)) * SPLITMIX_MUL2) & MASK64
+        if z ^ (z >> 31) >= KERNEL_THRESHOLD:
+            value += 1
+    return value
+
+
+def numpy_kernel(start, finish):
+    """python_kernel, computed a block of steps at a time with numpy"""
+    value = 0
+    for block in range(start, finish, KERNEL_BLOCK):
+        # uint64 array arithmetic wraps modulo 2**64, as the masks do above
+        z = numpy.arange(block + 1, min(block + KERNEL_BLOCK, finish) + 1, dtype=numpy.uint64)
+        z *= numpy.uint64(SPLITMIX_GAMMA)
+        z ^= z >> numpy.uint64(30)
+        z *= numpy.uint64(SPLITMIX_MUL1)
+        z ^= z >> numpy.uint64(27)
+        z *= numpy.uint64(SPLITMIX_MUL2)
+        z ^= z >> numpy.uint64(31)
+        value += int(numpy.count_nonzero(z >= numpy.uint64(KERNEL_THRESHOLD)))
+    return value
+
+
+KERNELS = {"python": python_kernel, "numpy": numpy_kernel}
+
+# ranges check_kernels compares the kernels on: empty and tiny ranges, a range
+# far from 0, and one spanning more than one numpy block
+KERNEL_CHECKS = [(0, 0), (0, 1), (0, 1000), (12345, 23456),
+                 (1 << 48, (1 << 48) + 1000), (5, KERNEL_BLOCK + 7)]
+
+
+def check_kernels():
+    """check that numpy_kernel gives the same results as python_kernel on
+       KERNEL_CHECKS, raising a RuntimeError if they differ.  Returns False,
+       having checked nothing, if numpy is not installed."""
+    if numpy is None:
+        return False
+    for start, finish in KERNEL_CHECKS:
+        expected = python_kernel(start, finish)
+        actual = numpy_kernel(start, finish)
+        if actual != expected:
+            raise RuntimeError("numpy kernel counted %i steps in [%i, %i), python kernel %i"
+                               % (actual, start, finish, expected))
+    return True
+
+# the name of the kernel do_range uses, or None to call do_step for every step
+kernel = None
+
+
+def select_kernel(name):
+    """make do_range use the named batch kernel.  "auto" picks numpy if it is
+       installed and python otherwise."""
+    global kernel
+    if name == "auto":
+        name = "numpy" if numpy is not None else "python"
+    if name not in KERNELS:
+        raise ValueError("unknown kernel %r" % name)
+    if name == "numpy" and numpy is None:
+        raise ValueError("the numpy kernel needs numpy installed")
+    kernel = name
+
+
+################################################################################
+## work scheduling #############################################################
+################################################################################
+
+# With the static schedule each worker gets one contiguous Nth of the steps, so
+# when step costs vary the slowest worker sets the total time.  The dynamic and
+# guided schedules cut the steps into chunks that workers take as they become
+# free: dynamic chunks all have the same size, while guided chunks start large
+# and shrink, keeping the number of hand-offs low without a long tail.
+
+SCHEDULES = ["static", "dynamic", "guided"]
+
+
+def parse_schedule(text):
+    """parse a schedule given as "name" or "name:chunk" into (name, chunk)"""
+    name, _, chunk = text.partition(":")
+    if name not in SCHEDULES:
+        raise ValueError("unknown schedule %r" % name)
+    chunk = int(chunk) if chunk else 1
+    if chunk < 1:
+        raise ValueError("schedule chunk must be at least 1, not %i" % chunk)
+    return name, chunk
+
+
+def schedule_chunks(N, n, schedule="static", chunk=1):
+    """return the list of (start, finish) ranges that n workers share N steps in.
+       static gives n ranges, the same as do_steps; dynamic gives ranges of
+       chunk steps; guided gives each range 1/n of the steps still remaining,
+       but never fewer than chunk."""
+    assert chunk >= 1, "chunk must be at least 1"
+    if schedule == "static":
+        return [(int(k * N / n), int(min((k + 1) * N / n, N))) for k in range(n)]
+
+    chunks = []
+    start = 0
+    while start < N:
+        size = chunk
+        if schedule == "guided":
+            size = max(chunk, -(-(N - start) // n))
+        finish = min(start + size, N)
+        chunks.append((start, finish))
+        start = finish
+    return chunks
+
+
 ################################################################################
 ## sequential implementation ###################################################
 ################################################################################
@@ -66,30 +232,48 @@ def run_sequential(N):
 ## threaded implementation #####################################################
 ################################################################################
 
-##### New Common Variable Threaded Implementation ##############################
+##### Per-Thread Slot Threaded Implementation #################################
+
+# Each worker writes its result into its own slot of a results list, so workers
+# never contend on a shared counter or lock, and nothing is left over between
+# calls.  The parent combines the slots with reduce_slots once every worker
+# has been joined.  Slots start out as None, so a worker that raised is
+# reported rather than counted as zero.
+
+def tree_sum(values):
+    """sum values by adding neighbouring pairs in rounds, as a reduction tree
+       does, so n values are combined in log2(n) rounds"""
+    values = list(values)
+    while len(values) > 1:
+        pairs = [values[i] + values[i + 1] for i in range(0, len(values) - 1, 2)]
+        if len(values) % 2:
+            pairs.append(values[-1])
+        values = pairs
+    return values[0] if values else 0
+
+
+def reduce_slots(results):
+    """return the tree_sum of the workers' result slots, raising if any worker
+       failed to fill its slot"""
+    missing = results.count(None)
+    if missing:
+        raise RuntimeError("%i of %i worker threads failed" % (missing, len(results)))
+    return tree_sum(results)
+
 
 class ThreadedWorker(Thread):
-    def __init__(self, k, n, N):
-        """initialize this thread to be the kth of n worker threads"""
+    def __init__(self, k, n, N, results):
+        """initialize this thread to be the kth of n worker threads, storing
+           its result in results[k]"""
         Thread.__init__(self)
         self.k = k
         self.n = n
         self.N = N
-
+        self.results = results
 
     def run(self):
-        global common_result
         """execute the worker thread's work"""
-        self.result = do_steps(self.k, self.n, self.N)
-        common_result_sema.acquire()
-        common_result += self.result
-        common_result_sema.release()
-
-
-global common_result
-common_result = 0
-global common_result_sema
-common_result_sema = Semaphore(1)
+        self.results[self.k] = do_steps(self.k, self.n, self.N)
 
 
 def run_threaded(num_threads, N):
@@ -101,12 +285,11 @@ def run_threaded(num_threads, N):
     # Note: import threading; help(threading.Thread)
     # Note: be sure that your implementation is concurrent!
 
-    # Create shared variable and corresponding semaphore
-
     # Create threads, add them to thread_list, and start them running
+    results = [None] * num_threads
     thread_list = []
     for i in range(num_threads):
-        current_thread = ThreadedWorker(i, num_threads, N)
+        current_thread = ThreadedWorker(i, num_threads, N, results)
         current_thread.start()
         thread_list.append(current_thread)
 
@@ -114,7 +297,48 @@ def run_threaded(num_threads, N):
     for current_t in thread_list:
         current_t.join()
 
-    return common_result
+    return reduce_slots(results)
+
+
+class ChunkWorker(Thread):
+    def __init__(self, chunks, results, slot):
+        """initialize this thread to take (start, finish) ranges from the
+           chunks queue until it is empty, storing its total in results[slot]"""
+        Thread.__init__(self)
+        self.chunks = chunks
+        self.results = results
+        self.slot = slot
+
+    def run(self):
+        """execute the worker thread's work"""
+        value = 0
+        while True:
+            try:
+                start, finish = self.chunks.get_nowait()
+            except queue.Empty:
+                break
+            value += do_range(start, finish)
+        self.results[self.slot] = value
+
+
+def run_chunk_workers(num_threads, chunks):
+    """run num_threads ChunkWorkers over the chunks queue and return their total"""
+    results = [None] * num_threads
+    thread_list = [ChunkWorker(chunks, results, i) for i in range(num_threads)]
+    for current_t in thread_list:
+        current_t.start()
+    for current_t in thread_list:
+        current_t.join()
+    return reduce_slots(results)
+
+
+def run_threaded_scheduled(num_threads, N, schedule, chunk=1):
+    """use num_thread threads to perform N steps, with the threads taking chunks
+       of steps from a shared queue as chosen by schedule_chunks"""
+    chunks = queue.SimpleQueue()
+    for start_finish in schedule_chunks(N, num_threads, schedule, chunk):
+        chunks.put(start_finish)
+    return run_chunk_workers(num_threads, chunks)
 
 
 #########################Origional Threaded Worker#############################
@@ -164,14 +388,22 @@ def run_threaded(num_threads, N):
 ## multiprocess implementation #################################################
 ################################################################################
 
-def create_python_subprocess(args):
+def create_python_subprocess(args, stdin=None):
     """Start a subprocess running this python file.  The command line arguments
        are given by "args", which should be a sequence of strings.
        For example, calling "create_python_subprocess(['child'])"
        has the same effect as running
-       "python parcount.py child" at the command line."""
+       "python parcount.py child" at the command line.
 
-    return Popen([sys.executable, sys.argv[0]] + args)
+       The child's standard output is connected to a pipe, which the parent
+       reads to collect the child's result.  Pass stdin=PIPE to also be able to
+       write to the child.  The child uses the same workload and batch kernel
+       as this process."""
+
+    options = ["--workload", workload]
+    if kernel is not None:
+        options += ["--kernel", kernel]
+    return Popen([sys.executable, __file__] + options + args, stdin=stdin, stdout=PIPE)
 
 
 def run_multiproc(num_children, N):
@@ -189,6 +421,9 @@ def run_multiproc(num_children, N):
     #       child process to the parent, it suits our purposes.
     # Note: be sure that your implementation is concurrent!
 
+    # Results come back over each child's stdout pipe rather than its exit
+    # code, which is truncated to 8 bits and so breaks once a child counts
+    # more than 255 steps.
     proc_list = []
     for i in range(num_children):
         current_proc = create_python_subprocess(["child", str(i), str(num_children), str(N)])
@@ -196,7 +431,51 @@ def run_multiproc(num_children, N):
 
     result = 0
     for proc in proc_list:
-        result += proc.wait()
+        output, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError("child exited with status %i" % proc.returncode)
+        result += int(output)
+    return result
+
+
+def run_multiproc_scheduled(num_children, N, schedule, chunk=1):
+    """use num_children subprocesses to perform N steps, handing each child a
+       new chunk of steps as soon as it reports the result of its last one"""
+    chunks = iter(schedule_chunks(N, num_children, schedule, chunk))
+    selector = selectors.DefaultSelector()
+
+    def assign(proc):
+        """send proc its next chunk, or close its input if there are none left"""
+        for start, finish in chunks:
+            proc.stdin.write(b"%i %i\n" % (start, finish))
+            proc.stdin.flush()
+            return True
+        proc.stdin.close()
+        return False
+
+    proc_list = []
+    for i in range(num_children):
+        current_proc = create_python_subprocess(["child", "chunks"], stdin=PIPE)
+        proc_list.append(current_proc)
+        if assign(current_proc):
+            selector.register(current_proc.stdout, selectors.EVENT_READ, current_proc)
+
+    # each child has at most one chunk outstanding, so it never has more than
+    # one line of output waiting to be read
+    result = 0
+    while selector.get_map():
+        for key, _ in selector.select():
+            proc = key.data
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError("child exited with status %i" % proc.wait())
+            result += int(line)
+            if not assign(proc):
+                selector.unregister(proc.stdout)
+
+    for proc in proc_list:
+        if proc.wait() != 0:
+            raise RuntimeError("child exited with status %i" % proc.returncode)
     return result
 
 
@@ -206,6 +485,298 @@ def run_child(k, n, N):
     return do_steps(k, n, N)
 
 
+def run_child_chunks():
+    """do the work of a subprocess started by run_multiproc_scheduled: read
+       "start finish" lines from stdin, and write the result of each"""
+    for line in sys.stdin:
+        start, finish = line.split()
+        print(do_range(int(start), int(finish)), flush=True)
+
+
+################################################################################
+## asyncio implementation ######################################################
+################################################################################
+
+# The I/O in do_step is a sleep, so a single thread can overlap any number of
+# steps as coroutines.  A semaphore bounds how many steps are in flight, and
+# steps are only created as slots free up, so memory stays proportional to the
+# concurrency limit rather than to N.
+
+async def do_step_async(i):
+    """do_step, with the I/O done as an asyncio sleep instead of a blocking one"""
+    await asyncio.sleep(0.01)
+    random.seed(i)
+    val = random.gauss(0, 2)
+    if (val > 1):
+        return 1
+    else:
+        return 0
+
+
+async def do_steps_async(N, concurrency):
+    """perform N steps as coroutines, at most concurrency at a time"""
+    limit = asyncio.Semaphore(concurrency)
+    pending = set()
+    total = 0
+
+    async def step(i):
+        nonlocal total
+        try:
+            # await before reading total: "total += await ..." would read it first
+            value = await do_step_async(i)
+            total += value
+        finally:
+            limit.release()
+
+    for i in range(N):
+        await limit.acquire()
+        task = asyncio.ensure_future(step(i))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    await asyncio.gather(*pending)
+    return total
+
+
+def run_asyncio(concurrency, N):
+    """use one thread running up to concurrency coroutines to perform N steps"""
+    return asyncio.run(do_steps_async(N, concurrency))
+
+
+################################################################################
+## process pool implementation #################################################
+################################################################################
+
+# run_multiproc starts a fresh interpreter for every child on every run.  A pool
+# starts its worker processes once, so repeated jobs pay only for the work.
+
+def pool_context():
+    """return a multiprocessing context whose workers start without re-running
+       this script: fork where available, otherwise forkserver or the default"""
+    methods = multiprocessing.get_all_start_methods()
+    for method in ("fork", "forkserver"):
+        if method in methods:
+            return multiprocessing.get_context(method)
+    return multiprocessing.get_context()
+
+
+def start_pool(num_workers):
+    """start a pool of num_workers processes, and wait until they are ready"""
+    pool = pool_context().Pool(num_workers)
+    pool.map(abs, range(num_workers), chunksize=1)
+    return pool
+
+
+def run_pool(pool, num_batches, N, schedule="static", chunk=1):
+    """use an already running pool to perform N steps, split into chunks by
+       schedule_chunks for num_batches workers.  The pool hands out the chunks
+       to its workers as they become free."""
+    chunks = schedule_chunks(N, num_batches, schedule, chunk)
+    return sum(pool.starmap(do_range, chunks, chunksize=1))
+
+
+################################################################################
+## hybrid process and thread implementation ####################################
+################################################################################
+
+# Threads overlap the I/O in do_step but share one interpreter lock; processes
+# run on separate cores.  The hybrid mode starts num_procs processes of
+# num_threads threads each, and thread t of process p performs batch
+# p * num_threads + t of num_procs * num_threads.
+
+def run_hybrid_child(conn, p, num_procs, num_threads, N):
+    """run process p's threads and send the sum of their results down conn"""
+    batches = schedule_chunks(N, num_procs * num_threads)
+    chunks = queue.SimpleQueue()
+    for start_finish in batches[p * num_threads:(p + 1) * num_threads]:
+        chunks.put(start_finish)
+    conn.send(run_chunk_workers(num_threads, chunks))
+    conn.close()
+
+
+def run_hybrid(num_procs, num_threads, N):
+    """use num_procs processes of num_threads threads each to perform N steps"""
+    context = pool_context()
+    children = []
+    for p in range(num_procs):
+        receiver, sender = context.Pipe(duplex=False)
+        child = context.Process(target=run_hybrid_child, args=(sender, p, num_procs, num_threads, N))
+        child.start()
+        sender.close()
+        children.append((child, receiver))
+
+    results = []
+    for child, receiver in children:
+        try:
+            results.append(receiver.recv())
+        except EOFError:
+            child.join()
+            raise RuntimeError("hybrid child exited with status %i" % child.exitcode)
+        child.join()
+    return tree_sum(results)
+
+
+################################################################################
+## distributed implementation ##################################################
+################################################################################
+
+# Workers are "parcount.py worker <port>" processes, on this host or any other,
+# which serve ranges of steps over TCP.  The coordinator opens one connection
+# per worker and sends it one chunk at a time as a line of JSON,
+# {"start": s, "finish": f}, and the worker answers with a line
+# {"start": s, "finish": f, "result": r}.  If a worker dies or its connection
+# fails, the chunk it was working on goes back on the queue for the others.
+
+class StepRequestHandler(socketserver.StreamRequestHandler):
+    """serve one coordinator connection: compute every chunk it sends"""
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            request["result"] = do_range(request["start"], request["finish"])
+            self.wfile.write(json.dumps(request).encode() + b"\n")
+            self.wfile.flush()
+
+
+class StepServer(socketserver.ThreadingTCPServer):
+    """a threading server whose connection threads don't keep it alive"""
+    daemon_threads = True
+
+
+def run_worker(port, host="127.0.0.1"):
+    """serve chunks of steps on host:port until killed.  The port actually
+       listened on is printed first, so port 0 picks any free port."""
+    with StepServer((host, port), StepRequestHandler) as server:
+        print(server.server_address[1], flush=True)
+        server.serve_forever()
+
+
+class DistributedJob(object):
+    """the chunks of a distributed run, shared by the coordinator's threads"""
+
+    def __init__(self, chunks, num_workers):
+        self.pending = list(reversed(chunks))
+        self.remaining = len(chunks)
+        self.live = num_workers
+        self.condition = Condition()
+
+    def take(self):
+        """return the next chunk to compute, or None once every chunk is done.
+           While other workers still hold chunks this waits, since any of
+           them may fail and hand its chunk back."""
+        with self.condition:
+            while not self.pending and self.remaining > 0:
+                self.condition.wait()
+            if self.remaining == 0:
+                return None
+            return self.pending.pop()
+
+    def finish(self):
+        with self.condition:
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.condition.notify_all()
+
+    def fail(self, chunk):
+        """record that a worker is gone, putting back the chunk it held"""
+        with self.condition:
+            if chunk is not None:
+                self.pending.append(chunk)
+            self.live -= 1
+            self.condition.notify_all()
+
+    def wait(self):
+        """wait until every chunk is done, or until every worker has failed"""
+        with self.condition:
+            while self.remaining > 0 and self.live > 0:
+                self.condition.wait()
+            if self.remaining > 0:
+                raise RuntimeError("every worker failed with %i chunks unfinished" % self.remaining)
+
+
+class RemoteWorker(Thread):
+    def __init__(self, address, job, results, slot, timeout=None):
+        """initialize this thread to feed job's chunks to the worker at
+           address, storing the total of the chunks it completes in
+           results[slot]"""
+        Thread.__init__(self)
+        self.address = address
+        self.job = job
+        self.results = results
+        self.slot = slot
+        self.timeout = timeout
+
+    def run(self):
+        """execute the worker thread's work"""
+        value = 0
+        chunk = None
+        try:
+            with socket.create_connection(self.address, timeout=self.timeout) as conn:
+                stream = conn.makefile("rwb")
+                while True:
+                    chunk = self.job.take()
+                    if chunk is None:
+                        break
+                    start, finish = chunk
+                    stream.write(json.dumps({"start": start, "finish": finish}).encode() + b"\n")
+                    stream.flush()
+                    line = stream.readline()
+                    if not line:
+                        raise ConnectionError("connection closed")
+                    value += json.loads(line)["result"]
+                    chunk = None
+                    self.job.finish()
+        except (OSError, ValueError, KeyError) as e:
+            if chunk is not None:
+                print("worker %s:%i failed (%s), reassigning steps [%i, %i)"
+                      % (self.address + (e,) + chunk), file=sys.stderr)
+            else:
+                print("worker %s:%i failed (%s)" % (self.address + (e,)), file=sys.stderr)
+            self.job.fail(chunk)
+        finally:
+            self.results[self.slot] = value
+
+
+def run_distributed(addresses, N, schedule="static", chunk=1, timeout=None):
+    """use the workers listening at addresses, a list of (host, port) pairs, to
+       perform N steps.  timeout bounds how long to wait on a worker before
+       treating it as failed."""
+    job = DistributedJob(schedule_chunks(N, len(addresses), schedule, chunk), len(addresses))
+    results = [0] * len(addresses)
+    thread_list = [RemoteWorker(address, job, results, i, timeout) for i, address in enumerate(addresses)]
+    for current_t in thread_list:
+        current_t.start()
+    job.wait()
+    for current_t in thread_list:
+        current_t.join()
+    return tree_sum(results)
+
+
+def parse_address(text):
+    """parse "host:port" into a (host, port) pair"""
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def start_local_workers(num_workers):
+    """start num_workers worker subprocesses on this host, and return the
+       processes and the addresses they listen on"""
+    procs = [create_python_subprocess(["worker", "0"]) for i in range(num_workers)]
+    addresses = [("127.0.0.1", int(proc.stdout.readline())) for proc in procs]
+    return procs, addresses
+
+
+def run_local_cluster(num_workers, N, schedule="static", chunk=1, timeout=None):
+    """start num_workers local workers, use them to perform N steps, and stop them"""
+    procs, addresses = start_local_workers(num_workers)
+    try:
+        return run_distributed(addresses, N, schedule, chunk, timeout)
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
+            proc.stdout.close()
+
+
 ################################################################################
 ## program main function #######################################################
 ################################################################################
@@ -213,44 +784,177 @@ def run_child(k, n, N):
 def usage():
     print("""
 expected usage:
-  %s %s <args>
+  %s %s [-N <num_steps>] [--workload io|cpu] [--kernel <kernel>]
+      [--timeout <seconds>] <args>
 
 where <args> is one of:
   sequential
-  threaded  <num_threads>
-  multiproc <num_subprocesses>
-  child     <arguments up to you>
+  threaded  <num_threads> [<schedule>]
+  multiproc <num_subprocesses> [<schedule>]
+  pool      <num_workers> [<num_jobs> [<schedule>]]
+  asyncio   [<concurrency>]
+  hybrid    <num_processes> <threads_per_process>
+  distributed <host>:<port>[,<host>:<port>...] [<schedule>]
+  cluster   <num_workers> [<schedule>]
+  worker    <port> [<host>]
+  child     <k> <n> <num_steps>
+  child     chunks
+  check
+
+-N sets the number of steps to perform (default 100).
+--workload chooses the I/O bound do_step (io, the default) or the CPU bound
+  do_step_cpu.  asyncio only supports io.
+--kernel computes each range of steps with a batch kernel instead of do_step:
+  python, numpy, or auto (numpy if it is installed).  asyncio ignores it.
+<schedule> is static (the default), dynamic[:<chunk>] or guided[:<min_chunk>].
+asyncio runs at most <concurrency> steps at once (default 1000).
+worker serves steps over TCP on <host> (default 127.0.0.1) and <port>, or on a
+  free port if <port> is 0, printing the port; distributed sends the steps to
+  running workers, and cluster starts <num_workers> local workers to send them to.
+--timeout makes distributed and cluster give up on a worker that takes longer
+  than <seconds> to connect or to answer a chunk, and hand its chunk to the
+  others (default: wait forever).
+check compares the numpy kernel's results with the python kernel's.
 """ % (sys.executable, sys.argv[0]))
     return -1
 
 
+def schedule_argument(text):
+    """parse_schedule for the command line, exiting with the usage if text is
+       not a valid schedule"""
+    try:
+        return parse_schedule(text)
+    except ValueError as e:
+        print(e)
+        sys.exit(usage())
+
+
 if __name__ == '__main__':
     """parse the command line, execute the program, and print out elapsed time"""
     N = 100
+    timeout = None
     start_time = time.time()
 
+    while len(sys.argv) > 2 and sys.argv[1] in ("-N", "--workload", "--kernel", "--timeout"):
+        if sys.argv[1] == "-N":
+            N = int(sys.argv[2])
+        elif sys.argv[1] == "--timeout":
+            timeout = float(sys.argv[2])
+        elif sys.argv[1] == "--workload":
+            if sys.argv[2] not in WORKLOADS:
+                sys.exit(usage())
+            workload = sys.argv[2]
+        else:
+            try:
+                select_kernel(sys.argv[2])
+            except ValueError as e:
+                print(e)
+                sys.exit(usage())
+        del sys.argv[1:3]
+
     if len(sys.argv) <= 1:
         sys.exit(usage())
     command = sys.argv[1]
 
+    schedule = ("static", 1)
+
     if command == "sequential":
         print(run_sequential(N))
 
     elif command == "threaded":
         if len(sys.argv) <= 2:
             sys.exit(usage())
-        print(run_threaded(int(sys.argv[2]), N))
+        if len(sys.argv) > 3:
+            schedule = schedule_argument(sys.argv[3])
+        if schedule[0] == "static":
+            print(run_threaded(int(sys.argv[2]), N))
+        else:
+            print(run_threaded_scheduled(int(sys.argv[2]), N, *schedule))
 
     elif command == "multiproc":
         if len(sys.argv) <= 2:
             sys.exit(usage())
-        print(run_multiproc(int(sys.argv[2]), N))
+        if len(sys.argv) > 3:
+            schedule = schedule_argument(sys.argv[3])
+        if schedule[0] == "static":
+            print(run_multiproc(int(sys.argv[2]), N))
+        else:
+            print(run_multiproc_scheduled(int(sys.argv[2]), N, *schedule))
+
+    elif command == "pool":
+        if len(sys.argv) <= 2:
+            sys.exit(usage())
+        num_workers = int(sys.argv[2])
+        num_jobs = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+        if len(sys.argv) > 4:
+            schedule = schedule_argument(sys.argv[4])
+
+        pool_start = time.time()
+        pool = start_pool(num_workers)
+        spawn_time = time.time() - pool_start
+        job_times = []
+        for job in range(num_jobs):
+            job_start = time.time()
+            print(run_pool(pool, num_workers, N, *schedule))
+            job_times.append(time.time() - job_start)
+        pool.close()
+        pool.join()
+
+        print("pool startup: ", spawn_time)
+        print("compute time: ", sum(job_times), "(%i jobs, %f per job)" % (num_jobs, sum(job_times) / num_jobs))
+
+    elif command == "asyncio":
+        if workload != "io":
+            sys.exit(usage())
+        concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        print(run_asyncio(concurrency, N))
+
+    elif command == "hybrid":
+        if len(sys.argv) <= 3:
+            sys.exit(usage())
+        print(run_hybrid(int(sys.argv[2]), int(sys.argv[3]), N))
+
+    elif command == "distributed":
+        if len(sys.argv) <= 2:
+            sys.exit(usage())
+        if len(sys.argv) > 3:
+            schedule = schedule_argument(sys.argv[3])
+        addresses = [parse_address(address) for address in sys.argv[2].split(",")]
+        print(run_distributed(addresses, N, *schedule, timeout=timeout))
+
+    elif command == "cluster":
+        if len(sys.argv) <= 2:
+            sys.exit(usage())
+        if len(sys.argv) > 3:
+            schedule = schedule_argument(sys.argv[3])
+        print(run_local_cluster(int(sys.argv[2]), N, *schedule, timeout=timeout))
+
+    elif command == "worker":
+        if len(sys.argv) <= 2:
+            sys.exit(usage())
+        run_worker(int(sys.argv[2]), *sys.argv[3:4])
+        sys.exit(0)
+
+    elif command == "check":
+        if not check_kernels():
+            print("numpy is not installed, nothing to check")
+            sys.exit(0)
+        print("numpy and python kernels agree")
 
     elif command == "child":
-        # Note: this is an abuse of the exit status indication
-        sys.exit(run_child(int(sys.argv[2]), int(sys.argv[3]), N))
+        if len(sys.argv) == 3 and sys.argv[2] == "chunks":
+            run_child_chunks()
+            sys.exit(0)
+        # the result goes to stdout, which the parent reads through a pipe
+        if len(sys.argv) <= 4:
+            sys.exit(usage())
+        print(run_child(int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])))
+        sys.exit(0)
 
     else:
         sys.exit(usage())
 
     print("elapsed time: ", time.time() - start_time)
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux
+        print("max rss (KiB): ", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
@@ -0,0 +1,103 @@
+"""Throughput and latency benchmark for the OneLaneBridge monitor in bridge.py.
+
+Starts thousands of car threads in random directions and measures how long
+each car waits in cross().  By default every car arrives at once, so the
+bridge is saturated; --arrival spreads the arrivals out instead.  For every
+max_batch setting it reports the throughput in cars per second over the busy
+period, from the first car entering the bridge to the last one leaving it, and
+the median, 99th percentile and worst wait in each direction."""
+
+from threading import Thread, Event
+import random
+import time
+
+from bridge import OneLaneBridge, north, south
+
+
+class TimedCar(Thread):
+    def __init__(self, bridge, direction, arrival, cross_time, start):
+        Thread.__init__(self)
+        self.bridge = bridge
+        self.direction = direction
+        self.arrival = arrival
+        self.cross_time = cross_time
+        self.start_event = start
+        self.wait = None
+        self.entered = None
+        self.left = None
+
+    def run(self):
+        # wait for the race to start, then drive to the bridge
+        self.start_event.wait()
+        time.sleep(self.arrival)
+
+        requested = time.perf_counter()
+        self.bridge.cross(self.direction)
+        self.entered = time.perf_counter()
+        self.wait = self.entered - requested
+
+        # drive across
+        time.sleep(self.cross_time)
+        self.bridge.finished()
+        self.left = time.perf_counter()
+
+
+def percentile(values, q):
+    """return the qth percentile of values (nearest rank)"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100.0))]
+
+
+def run_bridge(num_cars, max_batch, capacity, arrival_spread, cross_time, north_fraction):
+    """send num_cars cars over a fresh bridge, and return (the seconds from the
+       first car entering to the last car leaving, the waits of the northbound
+       cars, the waits of the southbound cars)"""
+    bridge = OneLaneBridge(max_batch, capacity)
+    start = Event()
+    cars = [TimedCar(bridge, north if random.random() < north_fraction else south,
+                     random.uniform(0, arrival_spread), cross_time, start)
+            for i in range(num_cars)]
+    for car in cars:
+        car.start()
+
+    start.set()
+    for car in cars:
+        car.join()
+    busy = max(car.left for car in cars) - min(car.entered for car in cars)
+
+    waits = [[], []]
+    for car in cars:
+        waits[car.direction].append(car.wait)
+    return busy, waits[north], waits[south]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="benchmark OneLaneBridge throughput and waiting times")
+    parser.add_argument("-c", "--cars", type=int, default=2000, help="number of car threads")
+    parser.add_argument("-b", "--max-batch", default="none,1,8,32",
+                        type=lambda text: [None if part == "none" else int(part) for part in text.split(",")],
+                        help="comma separated max_batch settings to compare; none for unbounded")
+    parser.add_argument("--capacity", type=int, help="most cars on the bridge at once (default: no limit)")
+    parser.add_argument("--arrival", type=float, default=0.0,
+                        help="cars arrive over this many seconds (default: all at once)")
+    parser.add_argument("--cross-time", type=float, default=0.001, help="seconds each car takes to cross")
+    parser.add_argument("--north", type=float, default=0.5, help="fraction of cars heading north")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("%9s %8s %10s   %-9s %9s %9s %9s"
+          % ("max_batch", "capacity", "cars/s", "direction", "p50 (ms)", "p99 (ms)", "max (ms)"))
+    for max_batch in args.max_batch:
+        random.seed(args.seed)
+        busy, north_waits, south_waits = run_bridge(args.cars, max_batch, args.capacity, args.arrival,
+                                                    args.cross_time, args.north)
+        for name, waits in (("north", north_waits), ("south", south_waits)):
+            if not waits:
+                continue
+            print("%9s %8s %10.1f   %-9s %9.2f %9.2f %9.2f"
+                  % ("none" if max_batch is None else max_batch, args.capacity or "none", args.cars / busy,
+                     name, 1000 * percentile(waits, 50), 1000 * percentile(waits, 99), 1000 * max(waits)))
+
+# vim:expandtab:tabstop=8:shiftwidth=4:softtabstop=4
@@ -5,6 +5,9 @@ import random
 north = 0
 south = 1
 
+# cars that may enter in one direction while the other is waiting
+DEFAULT_BATCH = 16
+
 
 class OneLaneBridge(object):
     """
@@ -13,23 +16,66 @@ class OneLaneBridge(object):
 
     Cars wishing to cross should call the cross function, once they have crossed
     they should call finished()
+
+    max_batch limits how many cars may enter in one direction while cars are
+    waiting to go the other way; once it is reached the bridge drains and the
+    direction switches, so neither direction can starve.  Passing None leaves
+    the batch unbounded, which lets a steady stream in one direction starve the
+    other.  capacity limits the number of cars on the bridge at once (None for
+    no limit).
     """
 
-    def __init__(self):
+    def __init__(self, max_batch=DEFAULT_BATCH, capacity=None):
         self.lock = Lock()
+        self.max_batch = max_batch
+        self.capacity = capacity
         self.current_direction = 0  # Indicates the current direction as either 0 North or 1 South
         self.cars_on_bridge = 0  # Indicates the number of cars currently on the bridge
 
         self.crossing = [0,0]  # number of threads that have returned from cross(i) but have not yet called finished
         # (here i can be either NORTH or SOUTH).
 
-        # predicate (not current_direction = direction) and (cars_on_bridge = 0)
-        # In english, I need to change the direction and there are no cars on the bridge
-        self.ready_for_switch = Condition(self.lock)
+        self.waiting = [0,0]  # number of threads blocked in cross(i)
+        self.batch = 0  # number of cars that have entered since the direction last switched
+
+        # predicate for can_cross[i]: _can_enter(i)
+        # Each direction waits on its own condition, so a car leaving only wakes
+        # cars that may be able to go, rather than every waiter in both directions.
+        self.can_cross = [Condition(self.lock), Condition(self.lock)]
 
         # Invariant 1: self.crossing[0] or self.crossing[1] must be 0 at any given time
-        # Invariant 2: cars_on_bridge >= 0
+        # Invariant 2: 0 <= cars_on_bridge <= capacity
         # Invariant 3: current_direction is either 0 or 1
+        # Invariant 4: batch only exceeds max_batch while nobody waits for the other direction
+
+
+    def _batch_done(self):
+        """the current direction has used up its batch"""
+        return self.max_batch is not None and self.batch >= self.max_batch
+
+    def _can_enter(self, direction):
+        """may a car going in direction enter the bridge now? (lock must be held)"""
+        # Invariant 2 - never go over capacity
+        if self.capacity is not None and self.cars_on_bridge >= self.capacity:
+            return False
+
+        if direction == self.current_direction:
+            # Invariant 4 - keep going unless the batch is used up and someone is
+            # waiting to go the other way
+            return not (self._batch_done() and self.waiting[1 - direction] > 0)
+
+        # Invariant 1 - the direction can only change on an empty bridge, and only
+        # when the current direction has used up its batch or has nobody waiting
+        return self.cars_on_bridge == 0 and (self._batch_done() or self.waiting[self.current_direction] == 0)
+
+    def _wake(self):
+        """wake one waiting car that can now enter, if there is one.  Every car
+           that enters calls this again, so a batch is let on one car after
+           another instead of by waking every waiter at once."""
+        for direction in (self.current_direction, 1 - self.current_direction):
+            if self.waiting[direction] > 0 and self._can_enter(direction):
+                self.can_cross[direction].notify()
+                return
 
 
     """
@@ -39,21 +85,29 @@ class OneLaneBridge(object):
 
     def cross(self, direction):
         with self.lock:
-            # While there are cars on the bridge going the opposite direction I want to go in, wait
-            while (direction != self.current_direction) and (self.cars_on_bridge > 0):
-                self.ready_for_switch.wait()
-
-            # Invariant 3 - When either the direction is the correct one, or there are no cars on the bridge, I can
-            # ensure the correct direction and enter the bridge.
-            self.current_direction = direction
-            # Invariant 2 - This increment can not cause the invariant to become false.
+            # While I can not enter (the bridge is going the other way, is full, or
+            # my direction has had its turn), wait on my direction's condition
+            if not self._can_enter(direction):
+                self.waiting[direction] += 1
+                while not self._can_enter(direction):
+                    self.can_cross[direction].wait()
+                self.waiting[direction] -= 1
+
+            # Invariant 3 - either the direction is already mine, or the bridge is
+            # empty and I may switch it.  A switch starts a new batch.
+            if direction != self.current_direction:
+                self.current_direction = direction
+                self.batch = 0
+            self.batch += 1
+            # Invariant 2 - _can_enter checked there is room for me.
             self.cars_on_bridge += 1
-            # To check invarient 1, At this time, the crossing of the opposite of current_direction must be
-            # zero because any car that wishes to go the opposite direction is waiting on ready_for_switch().
-            # If it passed ready_for_switch, then it has just changed the direction. This can only happen if a
-            # notify_all() was called because there were no cars on the bridge going either direction.
+            # Invariant 1 - the direction only changes when the bridge is empty, so
+            # crossing of the opposite direction is zero.
             self.crossing[self.current_direction] += 1
 
+            # Pass the wakeup on: the next car in my direction may be able to follow
+            self._wake()
+
     def finished(self):
         with self.lock:
             # To check invarient 1, a car can only get here if it has already incremented crossing, so a decrement
@@ -66,13 +120,11 @@ class OneLaneBridge(object):
             # so it cannot go below 0
             self.cars_on_bridge -= 1
 
-            # If there are no cars on the bridge behind me, I wake up all the cars who are waiting
-            # to go in the opposite direction
-            # Code is live because if there is no one on the bridge, the cars waiting for ready_for_switch get
-            # notify_all and when they regain the monitor lock, they can exit the loop and change the direction to their
-            # direction so they can cross
-            if self.cars_on_bridge == 0:
-                self.ready_for_switch.notify_all()
+            # I may have made room for a car in my direction, or emptied the bridge
+            # for the other direction; wake one of them, and it wakes the next.
+            # Code is live because every change that lets a waiting car enter (a car
+            # leaving, or a car entering after the direction switched) calls _wake.
+            self._wake()
 
 
 class Car(Thread):
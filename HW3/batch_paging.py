@@ -0,0 +1,143 @@
+"""Run a grid of paging simulations in parallel.
+
+Every combination of trace, page size, algorithm and frame count is simulated
+on a process pool sized to the available cores.  Each (trace, page size) pair
+is parsed once in the parent and handed to the workers when the pool starts, so
+no worker re-reads a trace file; with the fork start method the arrays are
+shared copy-on-write rather than copied.  Results are written as CSV or JSON."""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import paging
+
+
+FIELDS = ["trace", "page_size", "algorithm", "num_frames", "accesses", "page_faults", "seconds"]
+
+# (trace name, page size) -> (pages, next_use), installed in each worker by init_worker
+traces = {}
+
+
+def init_worker(shared):
+    global traces
+    traces = shared
+
+
+def available_cores():
+    """return the number of cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def simulate(name, page_size, algorithm, num_frames, seed):
+    """run one configuration against a preloaded trace and return its result row"""
+    pages, next_use = traces[(name, page_size)]
+    random.seed(seed)
+    start = time.perf_counter()
+    pager = paging.make_pager(algorithm, num_frames, pages, next_use)
+    pager.run(pages)
+    return {
+        "trace": name,
+        "page_size": page_size,
+        "algorithm": algorithm,
+        "num_frames": num_frames,
+        "accesses": len(pages),
+        "page_faults": pager.page_faults,
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+def load_traces(paths, page_sizes, need_next_use):
+    """parse every (trace, page size) pair once.  next-use arrays are only built
+       when OPT is in the grid, and are kept as arrays so that forked workers
+       do not touch (and so copy) their pages."""
+    loaded = {}
+    for path in paths:
+        name = os.path.basename(path)
+        for page_size in page_sizes:
+            pages = paging.open_trace(path, page_size)
+            next_use = None
+            if need_next_use:
+                next_use = paging.next_use_array(pages, array('q', bytes(8 * len(pages))))
+            loaded[(name, page_size)] = (pages, next_use)
+    return loaded
+
+
+def run_grid(paths, algorithms, frame_counts, page_sizes, workers=None, seed=0):
+    """simulate every configuration in the grid and return the result rows in
+       grid order"""
+    shared = load_traces(paths, page_sizes, "OPT" in algorithms)
+    names = [os.path.basename(path) for path in paths]
+    grid = list(itertools.product(names, page_sizes, algorithms, frame_counts))
+
+    forking = "fork" in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if forking else None)
+    if not forking:
+        # other start methods pickle initargs, and the mmap-backed memoryviews
+        # open_trace returns for binary traces cannot be pickled
+        shared = {key: (array('q', pages) if isinstance(pages, memoryview) else pages, next_use)
+                  for key, (pages, next_use) in shared.items()}
+    with ProcessPoolExecutor(max_workers=workers or available_cores(), mp_context=context,
+                             initializer=init_worker, initargs=(shared,)) as pool:
+        futures = [pool.submit(simulate, name, page_size, algorithm, num_frames, seed)
+                   for name, page_size, algorithm, num_frames in grid]
+        return [future.result() for future in futures]
+
+
+def write_results(rows, out, fmt):
+    if fmt == "json":
+        json.dump(rows, out, indent=2)
+        out.write("\n")
+    else:
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def int_list(text):
+    """argparse type for comma separated lists of integers"""
+    return [int(part) for part in text.split(",")]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="simulate a grid of paging configurations in parallel")
+    parser.add_argument("-a", "--algorithms", default=",".join(paging.ALGORITHMS),
+                        type=lambda text: text.split(","),
+                        help="comma separated algorithms to run (default: all)")
+    parser.add_argument("-n", "--num-frames", type=int_list, required=True,
+                        help="comma separated frame counts")
+    parser.add_argument("-s", "--page-sizes", type=int_list, default=[10],
+                        help="comma separated page sizes (default: 10)")
+    parser.add_argument("-j", "--workers", type=int,
+                        help="number of worker processes (default: available cores)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the Random pager")
+    parser.add_argument("-f", "--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("-o", "--output", help="file to write results to (default: stdout)")
+    parser.add_argument("traces", nargs="+", help="trace files, in the text or binary format")
+    args = parser.parse_args()
+
+    for algorithm in args.algorithms:
+        if algorithm not in paging.ALGORITHMS:
+            parser.error("unknown algorithm %r (choose from %s)" % (algorithm, ", ".join(paging.ALGORITHMS)))
+
+    start = time.perf_counter()
+    rows = run_grid(args.traces, args.algorithms, args.num_frames, args.page_sizes, args.workers, args.seed)
+    if args.output:
+        with open(args.output, "w", newline="") as out:
+            write_results(rows, out, args.format)
+    else:
+        write_results(rows, sys.stdout, args.format)
+    print("%i simulations in %.2fs" % (len(rows), time.perf_counter() - start), file=sys.stderr)
+
+# vim: ts=2 sw=2 ai et list
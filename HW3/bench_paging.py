@@ -0,0 +1,193 @@
+"""Benchmarks for the page replacement simulators in paging.py.
+
+Times each pager on the bundled traces against the original scan-based
+implementation (which found resident pages with a linear search of the frame
+list), both one access at a time and through the batch Pager.run loop, and
+checks that every variant reports the same number of page faults."""
+
+from collections import deque
+import random
+import sys
+import time
+
+import paging
+
+
+################################################################################
+# Scan-based reference implementations #########################################
+################################################################################
+
+class ScanPager(paging.Pager):
+    """The original Pager.access, which scans the frame list on every access."""
+
+    def access(self, address):
+        page_num = address
+        if page_num in self.frames:
+            return self.frames.index(page_num)
+        else:
+            self.page_faults += 1
+            index = self.evict()
+            self.frames[index] = page_num
+            return index
+
+
+class ScanFIFO(ScanPager, paging.FIFO):
+    pass
+
+
+class ScanRandom(ScanPager, paging.Random):
+    pass
+
+
+class ScanOPT(ScanPager):
+    """The original OPT, which scans every frame's future accesses on each fault."""
+
+    def __init__(self, num_frames, trace):
+        ScanPager.__init__(self, num_frames)
+        self.trace_counter = -1
+        self.mem_populated = False
+        self.pointer_to_populate = -1
+        self.address_dict = {}
+        for i, address in enumerate(trace):
+            self.address_dict.setdefault(address, deque()).append(i)
+
+    def access(self, address):
+        self.trace_counter += 1
+        return ScanPager.access(self, address)
+
+    def evict(self):
+        if not self.mem_populated:
+            self.pointer_to_populate += 1
+            if self.pointer_to_populate == (self.num_frames - 1):
+                self.mem_populated = True
+            return self.pointer_to_populate
+
+        next_use = [sys.maxsize] * self.num_frames
+        for i, address in enumerate(self.frames):
+            current_dq = self.address_dict[address]
+            while len(current_dq) > 0 and current_dq[0] <= self.trace_counter:
+                current_dq.popleft()
+            if len(current_dq) > 0:
+                next_use[i] = current_dq[0]
+
+        ind_to_evict = (0, 0)
+        for i, next_ind in enumerate(next_use):
+            if next_ind > ind_to_evict[1]:
+                ind_to_evict = (i, next_ind)
+        return ind_to_evict[0]
+
+
+class ScanLRU(ScanPager):
+    """The original deque-based LRU, which also scans the deque on every access."""
+
+    def __init__(self, num_frames):
+        ScanPager.__init__(self, num_frames)
+        self.deque_populated = False
+        self.dq = deque()
+        self.pointer_to_populate = -1
+        self.index_to_remove = 0
+
+    def access(self, address):
+        if address in self.dq:
+            self.dq.remove(address)
+            self.dq.append(address)
+        else:
+            if self.deque_populated:
+                address_to_remove = self.dq.popleft()
+                self.index_to_remove = self.frames.index(address_to_remove)
+            self.dq.append(address)
+        return ScanPager.access(self, address)
+
+    def evict(self):
+        if not self.deque_populated:
+            self.pointer_to_populate += 1
+            if self.pointer_to_populate == (self.num_frames - 1):
+                self.deque_populated = True
+            return self.pointer_to_populate
+        else:
+            return self.index_to_remove
+
+
+################################################################################
+# Benchmark driver #############################################################
+################################################################################
+
+def make_pager(cls, num_frames, trace):
+    if issubclass(cls, (paging.OPT, ScanOPT)):
+        return cls(num_frames, trace)
+    return cls(num_frames)
+
+
+def time_access(cls, num_frames, trace):
+    """return (page faults, seconds) for simulating trace with a fresh cls pager,
+       one checked access at a time as the original driver did."""
+    random.seed(0)
+    pager = make_pager(cls, num_frames, trace)
+    start = time.perf_counter()
+    for addr in trace:
+        frame = pager.access(addr)
+        assert (pager.frames[frame] == addr)
+    return pager.page_faults, time.perf_counter() - start
+
+
+def time_run(cls, num_frames, trace):
+    """return (page faults, seconds) for simulating trace with pager.run"""
+    random.seed(0)
+    pager = make_pager(cls, num_frames, trace)
+    start = time.perf_counter()
+    faults = pager.run(trace)
+    return faults, time.perf_counter() - start
+
+
+PAGERS = [
+    ("FIFO",   ScanFIFO,   paging.FIFO),
+    ("LRU",    ScanLRU,    paging.LRU),
+    ("Random", ScanRandom, paging.Random),
+    ("OPT",    ScanOPT,    paging.OPT),
+    ("CLOCK",  None,       paging.CLOCK),
+    ("ARC",    None,       paging.ARC),
+    ("2Q",     None,       paging.TwoQ),
+    # the array-backed variants make_pager(..., compact=True) picks
+    ("LRU-c",  ScanLRU,    paging.CompactLRU),
+    ("ARC-c",  None,       paging.CompactARC),
+    ("2Q-c",   None,       paging.CompactTwoQ),
+]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="compare pager implementations against the scan-based baseline")
+    parser.add_argument("-s", "--page-size", help="the page size", type=int, default=1)
+    parser.add_argument("-n", "--num-frames", help="the number of frames", type=int, default=512)
+    parser.add_argument("-a", "--algorithm", action="append", choices=[name for name, _, _ in PAGERS],
+                        help="only benchmark the given algorithm (may be repeated)")
+    parser.add_argument("traces", nargs="+",
+                        help="trace files, in the text or binary format")
+    args = parser.parse_args()
+
+    # scan: the original scan-based pager, one checked access at a time
+    # access: the indexed pager, one checked access at a time
+    # run: the indexed pager's batch run loop
+    print("%-16s %-7s %10s %9s %10s %8s %9s %9s"
+          % ("trace", "alg", "faults", "scan (s)", "access (s)", "run (s)", "scan/run", "acc/run"))
+    for path in args.traces:
+        trace = paging.open_trace(path, args.page_size)
+        name = path.split("/")[-1]
+        for alg, scan_cls, cls in PAGERS:
+            if args.algorithm and alg not in args.algorithm:
+                continue
+            faults, access_time = time_access(cls, args.num_frames, trace)
+            run_faults, run_time = time_run(cls, args.num_frames, trace)
+            assert run_faults == faults, "%s: run found %i faults, access found %i" % (alg, run_faults, faults)
+            if scan_cls is None:
+                scan = scan_speedup = "-"
+            else:
+                scan_faults, scan_time = time_access(scan_cls, args.num_frames, trace)
+                assert faults == scan_faults, "%s: %i faults, scan baseline had %i" % (alg, faults, scan_faults)
+                scan = "%.3f" % scan_time
+                scan_speedup = "%.1fx" % (scan_time / run_time)
+            print("%-16s %-7s %10i %9s %10.3f %8.3f %9s %8.1fx"
+                  % (name, alg, faults, scan, access_time, run_time, scan_speedup, access_time / run_time))
+
+# vim: ts=2 sw=2 ai et list
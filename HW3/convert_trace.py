@@ -0,0 +1,29 @@
+"""Convert paging traces between the text format (one decimal address per line)
+and the memory-mappable binary format read by paging.open_trace."""
+
+import argparse
+import sys
+
+import paging
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="convert a trace between the text and binary formats")
+    parser.add_argument("-w", "--width", type=int, choices=sorted(paging.BINARY_TYPECODES),
+                        help="bytes per address in the binary output (default: smallest that fits)")
+    parser.add_argument("-t", "--text", action="store_true",
+                        help="write the text format instead of the binary format")
+    parser.add_argument("input", help="the trace to read, in either format")
+    parser.add_argument("output", help="the file to write")
+    args = parser.parse_args()
+
+    addresses = paging.open_trace(args.input)
+    if args.text:
+        with open(args.output, "w") as f:
+            f.writelines("%i\n" % address for address in addresses)
+    else:
+        with open(args.output, "wb") as f:
+            paging.write_binary_trace(f, addresses, args.width)
+    print("wrote %i addresses to %s" % (len(addresses), args.output), file=sys.stderr)
+
+# vim: ts=2 sw=2 ai et list
@@ -0,0 +1,114 @@
+"""Generate synthetic paging traces for scaling benchmarks.
+
+Traces are produced a chunk at a time, so their length is limited only by disk
+space, and each chunk is built with C-level primitives: random.randbytes fills
+an array with random words, and map with operator and bisect functions turns
+them into page numbers without a Python-level loop per access.  The models are
+
+  uniform  every page of the footprint is equally likely
+  zipf     page i (counting from 1) has weight 1 / i**s
+  loop     a sequential scan over the footprint, repeated
+  phase    uniform accesses within a working set of --working-set pages that
+           moves to a random place in the footprint every --phase-length accesses
+
+Each access is page * page_size, written in the text format or, with
+--binary, the memory-mappable binary format read by paging.open_trace."""
+
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, repeat
+import operator
+import random
+import sys
+
+import paging
+
+
+CHUNK = 1 << 20
+MODELS = ["uniform", "zipf", "loop", "phase"]
+
+
+def random_words(k):
+    """return an array of k random unsigned 32-bit ints from the random module"""
+    words = array('I')
+    words.frombytes(random.randbytes(4 * k))
+    return words
+
+
+def uniform_pages(k, footprint):
+    return map(operator.mod, random_words(k), repeat(footprint))
+
+
+def zipf_thresholds(footprint, s):
+    """return cumulative zipf weights scaled to [0, 2**32), for bisecting random words"""
+    weights = list(accumulate(1.0 / (i ** s) for i in range(1, footprint + 1)))
+    scale = (1 << 32) / weights[-1]
+    return [int(weight * scale) for weight in weights]
+
+
+def generate(model, length, footprint, s=1.0, working_set=64, phase_length=100000):
+    """generate arrays of page numbers, CHUNK at a time, for a trace of length
+       accesses over footprint pages"""
+    thresholds = zipf_thresholds(footprint, s) if model == "zipf" else None
+    last_page = footprint - 1
+    position = 0
+    base = 0
+    while position < length:
+        k = min(CHUNK, length - position)
+        if model == "uniform":
+            pages = uniform_pages(k, footprint)
+        elif model == "zipf":
+            # clamp the rare word that falls past the last rounded threshold
+            pages = map(min, map(bisect_right, repeat(thresholds), random_words(k)), repeat(last_page))
+        elif model == "loop":
+            pages = map(operator.mod, range(position, position + k), repeat(footprint))
+        elif model == "phase":
+            # keep each chunk within one phase
+            if position % phase_length == 0:
+                base = random.randrange(footprint)
+            k = min(k, phase_length - position % phase_length)
+            offsets = uniform_pages(k, min(working_set, footprint))
+            pages = map(operator.mod, map(operator.add, offsets, repeat(base)), repeat(footprint))
+        else:
+            raise ValueError("unknown model %r" % model)
+        yield array('q', pages)
+        position += k
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="generate a synthetic paging trace")
+    parser.add_argument("model", choices=MODELS, help="the access pattern to generate")
+    parser.add_argument("-n", "--length", type=int, required=True, help="the number of accesses")
+    parser.add_argument("-f", "--footprint", type=int, default=1024, help="the number of distinct pages")
+    parser.add_argument("-s", "--page-size", type=int, default=1,
+                        help="the page size; each access is its page number times this")
+    parser.add_argument("--zipf-s", type=float, default=1.0, help="the zipf exponent")
+    parser.add_argument("--working-set", type=int, default=64, help="pages per phase for the phase model")
+    parser.add_argument("--phase-length", type=int, default=100000, help="accesses per phase for the phase model")
+    parser.add_argument("--seed", type=int, default=0, help="the random seed")
+    parser.add_argument("-b", "--binary", action="store_true", help="write the binary format instead of text")
+    parser.add_argument("output", help="the file to write")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    chunks = generate(args.model, args.length, args.footprint, args.zipf_s,
+                      args.working_set, args.phase_length)
+    if args.page_size != 1:
+        chunks = (array('q', map(operator.mul, chunk, repeat(args.page_size))) for chunk in chunks)
+
+    if args.binary:
+        width = 4 if args.footprint * args.page_size <= (1 << 32) else 8
+        with open(args.output, "wb") as f:
+            paging.write_binary_header(f, args.length, width)
+            for chunk in chunks:
+                paging.write_binary_addresses(f, chunk, width)
+    else:
+        with open(args.output, "w") as f:
+            for chunk in chunks:
+                f.write("\n".join(map(str, chunk)))
+                f.write("\n")
+    print("wrote %i accesses to %s" % (args.length, args.output), file=sys.stderr)
+
+# vim: ts=2 sw=2 ai et list
@@ -0,0 +1,255 @@
+"""Simulate several processes sharing one physical memory.
+
+Each trace is one process.  The scheduler runs the processes round robin,
+giving each one quantum accesses at a time, and pages are allocated under one
+of four policies:
+
+  global  one pager of num_frames frames shared by every process; any process
+          may evict any other's pages.
+  local   every process gets an equal, fixed share of the frames and its own
+          pager, and only ever evicts its own pages.
+  ws      working set: a process keeps the pages it referenced in its last tau
+          accesses (of its own virtual time).  When the working sets together
+          exceed memory, the largest of the other processes is deactivated
+          (swapped out) until it fits again; a process alone in memory drops
+          its own oldest page instead.
+  pff     page fault frequency: every process has an LRU allocation that grows
+          when its fault rate over a quantum exceeds the upper bound and shrinks
+          when it falls below the lower bound.  A finished process gives its
+          allocation back.
+
+Pages of different processes are kept apart by encoding (process, page) as
+page * num_processes + process, so the pagers still work on plain ints."""
+
+from collections import OrderedDict
+import random
+import time
+
+import paging
+
+
+class Process(object):
+    """Per-process bookkeeping: the trace, the position reached in it, and the
+       counters reported at the end of the run."""
+
+    def __init__(self, pid, name, pages, num_processes):
+        self.pid = pid
+        self.name = name
+        self.pages = pages
+        self.num_processes = num_processes
+        self.position = 0
+        self.faults = 0
+        self.quanta = 0
+        self.thrashing_quanta = 0
+        self.deactivations = 0
+
+    def done(self):
+        return self.position >= len(self.pages)
+
+    def next_slice(self, quantum):
+        """return the next quantum of accesses, encoded as global page numbers"""
+        start = self.position
+        self.position = min(start + quantum, len(self.pages))
+        n, pid = self.num_processes, self.pid
+        return [page * n + pid for page in self.pages[start:self.position]]
+
+
+def schedule(processes):
+    """generate the runnable processes round robin until all have finished"""
+    while True:
+        runnable = [process for process in processes if not process.done()]
+        if not runnable:
+            return
+        for process in runnable:
+            yield process
+
+
+################################################################################
+# Allocation policies ##########################################################
+################################################################################
+
+def run_global(processes, num_frames, quantum, algorithm, thrash_rate):
+    pager = paging.make_pager(algorithm, num_frames)
+    for process in schedule(processes):
+        accesses = process.next_slice(quantum)
+        before = pager.page_faults
+        faults = pager.run(accesses) - before
+        account(process, faults, len(accesses), thrash_rate)
+
+
+def run_local(processes, num_frames, quantum, algorithm, thrash_rate):
+    share = max(1, num_frames // len(processes))
+    pagers = [paging.make_pager(algorithm, share) for process in processes]
+    for process in schedule(processes):
+        accesses = process.next_slice(quantum)
+        pager = pagers[process.pid]
+        before = pager.page_faults
+        faults = pager.run(accesses) - before
+        account(process, faults, len(accesses), thrash_rate)
+
+
+def run_working_set(processes, num_frames, quantum, tau, thrash_rate):
+    # resident[pid] is an OrderedDict page -> time of last reference, oldest first
+    resident = [OrderedDict() for process in processes]
+    clock = [0] * len(processes)
+    active = [True] * len(processes)
+    swapped = [0] * len(processes)
+    in_use = 0
+
+    for process in schedule(processes):
+        pid = process.pid
+        if not active[pid]:
+            # a deactivated process waits until its working set fits in free memory,
+            # or until no other process is left running
+            running = any(active[i] and not processes[i].done() for i in range(len(processes)))
+            if running and in_use + swapped[pid] > num_frames:
+                continue
+            active[pid] = True
+
+        pages = resident[pid]
+        now = clock[pid]
+        faults = 0
+        accesses = process.next_slice(quantum)
+        for page in accesses:
+            now += 1
+            if page in pages:
+                pages.move_to_end(page)
+            else:
+                faults += 1
+                if in_use >= num_frames:
+                    # memory is full: swap out the process with the largest working set,
+                    # or if this process is alone in memory, drop its own oldest page
+                    others = [i for i in range(len(processes)) if i != pid and resident[i]]
+                    if others:
+                        victim = max(others, key=lambda i: len(resident[i]))
+                        active[victim] = False
+                        swapped[victim] = len(resident[victim])
+                        in_use -= swapped[victim]
+                        resident[victim].clear()
+                        processes[victim].deactivations += 1
+                    else:
+                        pages.popitem(last=False)
+                        in_use -= 1
+                in_use += 1
+            pages[page] = now
+            while True:
+                oldest = next(iter(pages))
+                if now - pages[oldest] < tau:
+                    break
+                del pages[oldest]
+                in_use -= 1
+        clock[pid] = now
+        account(process, faults, len(accesses), thrash_rate)
+        if process.done():
+            in_use -= len(pages)
+            pages.clear()
+
+
+def run_pff(processes, num_frames, quantum, lower, upper, thrash_rate):
+    share = max(1, num_frames // len(processes))
+    allocation = [share] * len(processes)
+    resident = [OrderedDict() for process in processes]
+    step = max(1, share // 8)
+
+    for process in schedule(processes):
+        pid = process.pid
+        pages = resident[pid]
+        faults = 0
+        accesses = process.next_slice(quantum)
+        for page in accesses:
+            if page in pages:
+                pages.move_to_end(page)
+                continue
+            faults += 1
+            if len(pages) >= allocation[pid]:
+                pages.popitem(last=False)
+            pages[page] = None
+        account(process, faults, len(accesses), thrash_rate)
+        if process.done():
+            allocation[pid] = 0
+            pages.clear()
+            continue
+
+        rate = faults / len(accesses)
+        free = num_frames - sum(allocation)
+        if rate > upper and free > 0:
+            allocation[pid] += min(step, free)
+        elif rate < lower and allocation[pid] > 1:
+            allocation[pid] = max(1, allocation[pid] - step)
+            while len(pages) > allocation[pid]:
+                pages.popitem(last=False)
+
+
+def account(process, faults, accesses, thrash_rate):
+    """add one quantum's faults to process, counting it as thrashing if the
+       fault rate in the quantum exceeds thrash_rate"""
+    process.faults += faults
+    process.quanta += 1
+    if accesses and faults / accesses > thrash_rate:
+        process.thrashing_quanta += 1
+
+
+################################################################################
+# Command line driver ##########################################################
+################################################################################
+
+POLICIES = ["global", "local", "ws", "pff"]
+
+
+def simulate(paths, policy, num_frames, page_size=10, quantum=1000, algorithm="LRU",
+             tau=5000, lower=0.001, upper=0.02, thrash_rate=0.1):
+    """run the traces at paths as concurrent processes and return the processes
+       with their counters filled in"""
+    processes = [Process(pid, path.split("/")[-1], paging.open_trace(path, page_size), len(paths))
+                 for pid, path in enumerate(paths)]
+    if policy == "global":
+        run_global(processes, num_frames, quantum, algorithm, thrash_rate)
+    elif policy == "local":
+        run_local(processes, num_frames, quantum, algorithm, thrash_rate)
+    elif policy == "ws":
+        run_working_set(processes, num_frames, quantum, tau, thrash_rate)
+    elif policy == "pff":
+        run_pff(processes, num_frames, quantum, lower, upper, thrash_rate)
+    else:
+        raise ValueError("unknown policy %r" % policy)
+    return processes
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="simulate processes sharing physical memory")
+    parser.add_argument("-s", "--page-size", type=int, default=10, help="the page size")
+    parser.add_argument("-n", "--num-frames", type=int, required=True, help="the number of physical frames")
+    parser.add_argument("-q", "--quantum", type=int, default=1000, help="accesses per scheduling quantum")
+    parser.add_argument("-p", "--policy", action="append", choices=POLICIES,
+                        help="allocation policy to compare (may be repeated; default: all)")
+    parser.add_argument("-a", "--algorithm", default="LRU",
+                        choices=[name for name in paging.ALGORITHMS if name != "OPT"],
+                        help="replacement algorithm for the global and local policies")
+    parser.add_argument("--tau", type=int, default=5000, help="working set window, in accesses")
+    parser.add_argument("--pff-bounds", default="0.001:0.02", metavar="LOW:HIGH",
+                        help="page fault frequency bounds for the pff policy")
+    parser.add_argument("--thrash-rate", type=float, default=0.1,
+                        help="count a quantum as thrashing when its fault rate exceeds this")
+    parser.add_argument("traces", nargs="+", help="one trace file per process")
+    args = parser.parse_args()
+    lower, upper = [float(bound) for bound in args.pff_bounds.split(":")]
+
+    random.seed(0)
+    for policy in args.policy or POLICIES:
+        start = time.perf_counter()
+        processes = simulate(args.traces, policy, args.num_frames, args.page_size, args.quantum,
+                             args.algorithm, args.tau, lower, upper, args.thrash_rate)
+        elapsed = time.perf_counter() - start
+        accesses = sum(len(process.pages) for process in processes)
+
+        print("policy %s: %i accesses in %.2fs" % (policy, accesses, elapsed))
+        print("  %-16s %10s %10s %12s %10s" % ("process", "accesses", "faults", "thrashing", "swapouts"))
+        for process in processes:
+            print("  %-16s %10i %10i %5i/%-6i %10i"
+                  % (process.name, len(process.pages), process.faults,
+                     process.thrashing_quanta, process.quanta, process.deactivations))
+        print("  %-16s %10i %10i" % ("total", accesses, sum(process.faults for process in processes)))
+
+# vim: ts=2 sw=2 ai et list
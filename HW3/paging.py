@@ -1,25 +1,365 @@
-from collections import deque
+import argparse
+from array import array
+from collections import OrderedDict
+import csv
+import hashlib
+import heapq
+from itertools import chain, islice, repeat
+import json
+import mmap
+import operator
+import os
 import random
+import struct
 import sys
+import tempfile
+import time
 from threading import Thread, Semaphore
 
+################################################################################
+# Trace loading ###############################################################
+################################################################################
+
+# Traces are held as array('q') rather than lists: 8 bytes per access instead of a boxed int
+# plus a list slot, and array.extend(map(...)) parses and divides in C without a Python loop.
+
+READ_CHUNK = 1 << 16
+
+
+def page_op(page_size):
+    """return (op, operand) such that op(address, operand) is the page number of
+       address: a shift when page_size is a power of two, division otherwise."""
+    if page_size & (page_size - 1) == 0:
+        return operator.rshift, page_size.bit_length() - 1
+    return operator.floordiv, page_size
+
+
+def read_text_chunks(f, page_size=1):
+    """generate arrays holding the page numbers of successive chunks of the text
+       trace (one decimal address per line) in the open file f."""
+    op, operand = page_op(page_size)
+    tail = ''
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            break
+        chunk = tail + chunk
+        cut = chunk.rfind('\n') + 1
+        tail = chunk[cut:]
+        yield array('q', map(op, map(int, chunk[:cut].split()), repeat(operand)))
+    if tail.strip():
+        yield array('q', map(op, map(int, tail.split()), repeat(operand)))
+
+
+def load_trace(f, page_size=1):
+    """read a text trace from the open file f and return the page number of each
+       address as an array.  The file is parsed a chunk at a time, so the whole
+       text is never held in memory at once."""
+    pages = array('q')
+    for chunk in read_text_chunks(f, page_size):
+        pages.extend(chunk)
+    return pages
+
+
+# Binary traces start with a fixed header (magic, format version, address width in bytes,
+# padding, address count) followed by the addresses as little-endian unsigned integers.
+# They can be memory-mapped and used in place, so a run starts without parsing anything
+# and many simulator processes can share one copy of the trace through the page cache.
+
+BINARY_MAGIC = b'PGTR'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sBBHQ')
+BINARY_TYPECODES = {4: 'I', 8: 'Q'}
+
+
+def page_numbers(addresses, page_size):
+    """return an array holding the page number of each address in addresses"""
+    if page_size == 1:
+        return addresses
+    op, operand = page_op(page_size)
+    return array('q', map(op, addresses, repeat(operand)))
+
+
+def write_binary_header(f, count, width):
+    """start a binary trace of count addresses of width bytes in the open file f"""
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, width, 0, count))
+
+
+def write_binary_addresses(f, addresses, width):
+    """append addresses to a binary trace started with write_binary_header"""
+    data = array(BINARY_TYPECODES[width], addresses)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    data.tofile(f)
+
+
+def write_binary_trace(f, addresses, width=None):
+    """write addresses to the open binary file f in the binary trace format.  width
+       is the size of each address in bytes (4 or 8); by default the smallest
+       width that holds every address is used."""
+    if width is None:
+        width = 4 if not addresses or max(addresses) < (1 << 32) else 8
+    write_binary_header(f, len(addresses), width)
+    write_binary_addresses(f, addresses, width)
+
+
+def map_binary_trace(path):
+    """memory-map the binary trace at path and return its addresses as a read-only
+       memoryview of unsigned integers.  No data is copied on little-endian
+       machines; the mapping stays open for as long as the view is referenced."""
+    with open(path, 'rb') as f:
+        header = f.read(BINARY_HEADER.size)
+        magic, version, width, _, count = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION or width not in BINARY_TYPECODES:
+            raise ValueError("%s is not a version %i binary trace" % (path, BINARY_VERSION))
+        if count == 0:
+            return array(BINARY_TYPECODES[width])
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    end = BINARY_HEADER.size + count * width
+    if len(mapping) < end:
+        raise ValueError("%s is truncated: expected %i addresses" % (path, count))
+    view = memoryview(mapping)[BINARY_HEADER.size:end].cast(BINARY_TYPECODES[width])
+    if sys.byteorder != 'little':
+        view = array(BINARY_TYPECODES[width], view)
+        view.byteswap()
+    return view
+
+
+def is_binary_trace(path):
+    """return True if the file at path starts with the binary trace header"""
+    if path == '-':
+        return False
+    with open(path, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def open_trace(path, page_size=1):
+    """return the page numbers of the trace at path, which may be in either the
+       text or the binary format ('-' reads a text trace from stdin).  Binary
+       traces with a page size of 1 are used in place without copying."""
+    if is_binary_trace(path):
+        return page_numbers(map_binary_trace(path), page_size)
+    if path == '-':
+        return load_trace(sys.stdin, page_size)
+    with open(path) as f:
+        return load_trace(f, page_size)
+
+
+################################################################################
+# Streaming traces ############################################################
+################################################################################
+
+# In streaming mode the trace is never materialized in memory. FIFO, LRU and Random never
+# look ahead, so they simply consume iter_trace. OPT needs the next use of every access, so
+# spool_trace makes two passes: the first copies the page numbers into an unlinked temporary
+# file, the second walks that file backwards filling a second file with the next-use array.
+# Both are memory-mapped, so only the distinct pages and the frames are held in memory.
+
+def iter_trace_chunks(path, page_size=1):
+    """generate arrays of page numbers for successive chunks of the trace at path"""
+    if is_binary_trace(path):
+        addresses = map_binary_trace(path)
+        for start in range(0, len(addresses), READ_CHUNK):
+            chunk = addresses[start:start + READ_CHUNK]
+            yield array('q', chunk) if page_size == 1 else page_numbers(chunk, page_size)
+    elif path == '-':
+        yield from read_text_chunks(sys.stdin, page_size)
+    else:
+        with open(path) as f:
+            yield from read_text_chunks(f, page_size)
+
+
+def iter_trace(path, page_size=1):
+    """generate the page numbers of the trace at path one at a time"""
+    return chain.from_iterable(iter_trace_chunks(path, page_size))
+
+
+def map_scratch(num_entries):
+    """return a writable memoryview of num_entries 64-bit ints backed by an unlinked
+       temporary file"""
+    if num_entries == 0:
+        return array('q')
+    with tempfile.TemporaryFile() as f:
+        f.truncate(num_entries * 8)
+        mapping = mmap.mmap(f.fileno(), num_entries * 8)
+    return memoryview(mapping).cast('q')
+
+
+def spool_trace(path, page_size=1):
+    """return (pages, next_use) for the trace at path, both as file-backed
+       memoryviews, reading the trace in a single streaming pass."""
+    with tempfile.TemporaryFile() as f:
+        num_entries = 0
+        for chunk in iter_trace_chunks(path, page_size):
+            chunk.tofile(f)
+            num_entries += len(chunk)
+        f.flush()
+        if num_entries == 0:
+            return array('q'), array('q')
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    pages = memoryview(mapping).cast('q')
+    return pages, next_use_array(pages, map_scratch(num_entries))
+
+
 # ###############################################################################
 # Shared paging simulation infrastructure #####################################
 ################################################################################
 
+# the page number stored in a frame that holds no page, and the page table entry of a
+# page that is not resident
+EMPTY = -1
+
+# Page table entries at or below GHOST mark pages that are not resident but are still
+# remembered by a ghost list (ARC and 2Q): GHOST - slot for the page in ghost slot slot.
+GHOST = -2
+
+# Page tables are arrays indexed by page number for as long as page numbers stay below
+# max(DENSE_PAGES, 8 * num_frames); a pager that sees a larger page switches to a dict.
+DENSE_PAGES = 1 << 20
+
+
+class SparsePageTable(dict):
+    """A page table for page numbers too spread out to index an array with.  Pages
+       without an entry read as EMPTY, as they do in the array page table."""
+
+    __slots__ = ()
+
+    def __missing__(self, page):
+        return EMPTY
+
+
+class SlotLists(object):
+    """Doubly linked lists of the slots 0 .. size - 1, threaded through the prev and
+       next arrays, so that moving a slot to the end of a list is a few array stores.
+       List l is a ring through the sentinel slot size + l, and lengths[l] counts its
+       slots; each slot is in at most one list.  remove and move_to_end take a slot
+       that is in list which; a slot in no list must be appended instead."""
+
+    __slots__ = ('size', 'prev', 'next', 'lengths')
+
+    def __init__(self, size, num_lists=1):
+        self.size = size
+        self.prev = array('q', range(size + num_lists))
+        self.next = array('q', range(size + num_lists))
+        self.lengths = [0] * num_lists
+
+    def append(self, which, slot):
+        sentinel = self.size + which
+        prev = self.prev
+        tail = prev[sentinel]
+        self.next[tail] = slot
+        prev[slot] = tail
+        self.next[slot] = sentinel
+        prev[sentinel] = slot
+        self.lengths[which] += 1
+
+    def remove(self, which, slot):
+        prev, succ = self.prev, self.next
+        before, after = prev[slot], succ[slot]
+        succ[before] = after
+        prev[after] = before
+        prev[slot] = succ[slot] = slot
+        self.lengths[which] -= 1
+
+    def move_to_end(self, which, slot):
+        self.remove(which, slot)
+        self.append(which, slot)
+
+    def first(self, which):
+        """return the oldest slot of list which; the list must not be empty"""
+        return self.next[self.size + which]
+
+    def pop_first(self, which):
+        slot = self.next[self.size + which]
+        self.remove(which, slot)
+        return slot
+
+
 class Pager(object):
     """Pager objects implement page replacement strategies.  A program can call
        pager.access(addr) to indicate that the given address is being accessed;
        the Pager will ensure that that page is loaded and return the corresponding
        frame number.
 
-       The Pager keeps track of the number of page faults."""
+       The Pager keeps track of the number of page faults.
+
+       page_table maps each page to the frame holding it, or to EMPTY if it is
+       not resident, and is kept in step with frames so that hits and faults
+       never scan the frame list.  It is an array indexed by page number, grown
+       by reserve as larger pages turn up, or a SparsePageTable when page
+       numbers are too spread out for that.
+
+       pager.run(trace) simulates a whole trace at once.  Subclasses implement it
+       as a tight loop over local variables, leaving the pager in the same state
+       as calling access for every address would.
+
+       frames is an array of page numbers, with EMPTY marking unused frames.
+       Pagers declare __slots__ and keep their per-frame state in arrays, so
+       memory per frame is a few machine words rather than a few Python
+       objects, except for the recency lists of LRU, ARC and 2Q, which are
+       OrderedDicts for speed; CompactLRU, CompactARC and CompactTwoQ keep
+       those in arrays too.  Every pager fills its empty frames before it
+       evicts a page."""
+
+    __slots__ = ('page_faults', 'frames', 'page_table', 'table_size', 'num_frames')
 
     def __init__(self, num_frames):
         self.page_faults = 0
-        self.frames = [None for i in range(num_frames)]
+        self.frames = array('q', [EMPTY]) * num_frames
+        self.page_table = array('q')
+        self.table_size = 0
         self.num_frames = num_frames
 
+    def reserve(self, max_page):
+        """make the page table able to hold pages up to max_page.  The array
+           doubles as needed, or becomes a SparsePageTable once max_page is too
+           large for it; a sparse table instead drops its non-resident entries
+           when they outnumber the frames."""
+        table = self.page_table
+        if isinstance(table, SparsePageTable):
+            if len(table) > 4 * self.num_frames + 1024:
+                live = [(page, slot) for page, slot in table.items() if slot != EMPTY]
+                table.clear()
+                table.update(live)
+            return
+        if max_page < self.table_size:
+            return
+
+        limit = max(DENSE_PAGES, 8 * self.num_frames)
+        if max_page >= limit:
+            self.page_table = SparsePageTable((page, slot) for page, slot in enumerate(table) if slot != EMPTY)
+            self.table_size = sys.maxsize
+            return
+        size = min(max(max_page + 1, 2 * self.table_size, 64), limit)
+        table.extend(array('q', [EMPTY]) * (size - self.table_size))
+        self.table_size = size
+
+    def reserve_trace(self, trace):
+        """reserve room in the page table for every page in trace, and return
+           True; or return False if trace is an iterator, whose pages cannot be
+           known in advance.  run then passes it to run_chunks."""
+        if not hasattr(trace, '__len__'):
+            return False
+        if len(trace):
+            self.reserve(max(trace))
+        return True
+
+    def run_chunks(self, trace):
+        """run the pages of an iterator a chunk at a time"""
+        pages = iter(trace)
+        while True:
+            chunk = array('q', islice(pages, READ_CHUNK))
+            if not chunk:
+                return self.page_faults
+            self.run(chunk)
+
+    def lookup(self, page):
+        """return page's page table entry, growing the table first if needed"""
+        if page >= self.table_size:
+            self.reserve(page)
+        return self.page_table[page]
+
     def evict(self):
         """return the frame number of a page to be evicted."""
         # This will be implemented in your subclasses below.
@@ -30,22 +370,45 @@ class Pager(object):
         frame number of the loaded page."""
 
         page_num = address
-        if page_num in self.frames:
+        frame = self.lookup(page_num)
+        if frame >= 0:
             # hit
-            return self.frames.index(page_num)
+            return frame
         else:
             # fault
             self.page_faults += 1
             index = self.evict()
+            evictee = self.frames[index]
+            # the evicted page may already have moved to a ghost list
+            if evictee != EMPTY and self.page_table[evictee] == index:
+                self.page_table[evictee] = EMPTY
             self.frames[index] = page_num
+            self.page_table[page_num] = index
             return index
 
+    def run(self, trace):
+        """access every address in trace and return the total number of page faults"""
+        access = self.access
+        for address in trace:
+            access(address)
+        return self.page_faults
+
+    def run_checked(self, trace):
+        """like run, but goes through access and checks that each returned frame
+        holds the accessed page."""
+        for address in trace:
+            frame = self.access(address)
+            assert (self.frames[frame] == address)
+        return self.page_faults
+
 
 ################################################################################
 # Paging algorithm implementations ############################################
 ################################################################################
 
 class FIFO(Pager):
+    __slots__ = ('head',)
+
     def __init__(self, num_frames):
         Pager.__init__(self, num_frames)
         self.head = 0
@@ -64,34 +427,116 @@ class FIFO(Pager):
             self.head += 1
         return evictee
 
-# I will implement this with a Deque. I will first populate the deque.
-# Then, when a page is accessed, I will move it to the top of the deque. When a page needs to be evicted
-# I will take the one at the bottom of the deque.
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        num_frames = self.num_frames
+        head = self.head
+        faults = self.page_faults
+        for page in trace:
+            if page_table[page] >= 0:
+                continue
+            faults += 1
+            evictee = frames[head]
+            if evictee != EMPTY:
+                page_table[evictee] = EMPTY
+            frames[head] = page
+            page_table[page] = head
+            head += 1
+            if head == num_frames:
+                head = 0
+        self.head = head
+        self.page_faults = faults
+        return faults
+
+# I will implement this with an OrderedDict, recency, mapping each resident page to its frame.
+# Newly loaded pages are appended to the end, and when a page is accessed, I move it to the end
+# as well. When a page needs to be evicted I take the one at the front.
 class LRU(Pager):
+    __slots__ = ('recency', 'deque_populated', 'pointer_to_populate')
+
     def __init__(self, num_frames):
         Pager.__init__(self, num_frames)
+        self.recency = OrderedDict()
         self.deque_populated = False
-        self.dq = deque()
         self.pointer_to_populate = -1
-        self.index_to_remove = 0
 
     def access(self, address):
-        if address in self.dq:
-            self.dq.remove(address)
-            self.dq.append(address)
+        recency = self.recency
+        if address in recency:
+            recency.move_to_end(address)
+            return recency[address]
+        frame = Pager.access(self, address)
+        recency[address] = frame
+        return frame
+
+    # If the frames aren't all populated, no need to actually evict. Otherwise pop the front
+    def evict(self):
+        if not self.deque_populated:
+            self.pointer_to_populate += 1
+            if self.pointer_to_populate == (self.num_frames - 1):
+                self.deque_populated = True
+            return self.pointer_to_populate
         else:
-            if self.deque_populated:
-                address_to_remove = self.dq.popleft()
+            page, frame = self.recency.popitem(last=False)
+            return frame
 
-                # Set variable so evict knows which to return
-                self.index_to_remove = self.frames.index(address_to_remove)
-                self.dq.append(address)
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        recency = self.recency
+        move_to_end = recency.move_to_end
+        num_frames = self.num_frames
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            if page in recency:
+                move_to_end(page)
+                continue
+            faults += 1
+            if free < num_frames:
+                frame = free
+                free += 1
             else:
-                self.dq.append(address)
+                evictee, frame = recency.popitem(last=False)
+                page_table[evictee] = EMPTY
+            frames[frame] = page
+            page_table[page] = frame
+            recency[page] = frame
+        self.pointer_to_populate = free - 1
+        self.deque_populated = free == num_frames
+        self.page_faults = faults
+        return faults
 
-        return Pager.access(self, address)
 
-    # If deque isn't fully populated, no need to actually evict. Otherwise pop_left
+# CompactLRU is LRU with the frames kept in a linked list in order of use instead of an
+# OrderedDict (SlotLists threads it through two arrays indexed by frame), so it needs a few
+# machine words per frame rather than a dict entry and a list node. The list is pure Python,
+# so it runs at about half LRU's speed; make_pager picks it with compact=True.
+class CompactLRU(Pager):
+    __slots__ = ('recency', 'deque_populated', 'pointer_to_populate')
+
+    def __init__(self, num_frames):
+        Pager.__init__(self, num_frames)
+        self.recency = SlotLists(num_frames)
+        self.deque_populated = False
+        self.pointer_to_populate = -1
+
+    def access(self, address):
+        if self.lookup(address) < 0 and not self.deque_populated:
+            # a free frame joins the list; any other frame is already on it
+            frame = Pager.access(self, address)
+            self.recency.append(0, frame)
+            return frame
+        frame = Pager.access(self, address)
+        self.recency.move_to_end(0, frame)
+        return frame
+
+    # If the frames aren't all populated, no need to actually evict. Otherwise take the front
     def evict(self):
         if not self.deque_populated:
             self.pointer_to_populate += 1
@@ -99,10 +544,51 @@ class LRU(Pager):
                 self.deque_populated = True
             return self.pointer_to_populate
         else:
-            return self.index_to_remove
+            return self.recency.first(0)
+
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        prev = self.recency.prev
+        succ = self.recency.next
+        num_frames = self.num_frames
+        sentinel = num_frames
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            frame = page_table[page]
+            if frame < 0:
+                faults += 1
+                if free < num_frames:
+                    frame = free
+                    free += 1
+                    self.recency.lengths[0] += 1
+                else:
+                    frame = succ[sentinel]
+                    page_table[frames[frame]] = EMPTY
+                frames[frame] = page
+                page_table[page] = frame
+            # move frame to the end of the list
+            before = prev[frame]
+            after = succ[frame]
+            succ[before] = after
+            prev[after] = before
+            tail = prev[sentinel]
+            succ[tail] = frame
+            prev[frame] = tail
+            succ[frame] = sentinel
+            prev[sentinel] = frame
+        self.pointer_to_populate = free - 1
+        self.deque_populated = free == num_frames
+        self.page_faults = faults
+        return faults
 
 
 class Random(Pager):
+    __slots__ = ('mem_populated', 'pointer_to_populate')
+
     def __init__(self, num_frames):
         Pager.__init__(self, num_frames)
         self.mem_populated = False
@@ -121,29 +607,664 @@ class Random(Pager):
         else:
             return random.randint(0, (self.num_frames - 1))
 
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        randint = random.randint
+        last_frame = self.num_frames - 1
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            if page_table[page] >= 0:
+                continue
+            faults += 1
+            if free <= last_frame:
+                frame = free
+                free += 1
+            else:
+                frame = randint(0, last_frame)
+                page_table[frames[frame]] = EMPTY
+            frames[frame] = page
+            page_table[page] = frame
+        self.pointer_to_populate = free - 1
+        self.mem_populated = free > last_frame
+        self.page_faults = faults
+        return faults
+
+
+# CLOCK approximates LRU with a reference bit per frame and a hand that sweeps the frames in
+# order. Every access sets the page's bit; on a fault the hand clears set bits as it passes
+# them and stops at the first clear one, so a recently used page gets a second chance.
+class CLOCK(Pager):
+    __slots__ = ('referenced', 'hand')
+
+    def __init__(self, num_frames):
+        Pager.__init__(self, num_frames)
+        self.referenced = bytearray(num_frames)
+        self.hand = 0
+
+    def access(self, address):
+        frame = Pager.access(self, address)
+        self.referenced[frame] = 1
+        return frame
+
+    def evict(self):
+        while self.referenced[self.hand]:
+            self.referenced[self.hand] = 0
+            self.hand += 1
+            if self.hand == self.num_frames:
+                self.hand = 0
+        evictee = self.hand
+        self.hand += 1
+        if self.hand == self.num_frames:
+            self.hand = 0
+        return evictee
+
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        referenced = self.referenced
+        num_frames = self.num_frames
+        hand = self.hand
+        faults = self.page_faults
+        for page in trace:
+            frame = page_table[page]
+            if frame < 0:
+                faults += 1
+                while referenced[hand]:
+                    referenced[hand] = 0
+                    hand += 1
+                    if hand == num_frames:
+                        hand = 0
+                frame = hand
+                hand += 1
+                if hand == num_frames:
+                    hand = 0
+                evictee = frames[frame]
+                if evictee != EMPTY:
+                    page_table[evictee] = EMPTY
+                frames[frame] = page
+                page_table[page] = frame
+            referenced[frame] = 1
+        self.hand = hand
+        self.page_faults = faults
+        return faults
+
+
+# ARC (Megiddo and Modha) splits the resident pages into t1, pages seen once recently, and t2,
+# pages seen at least twice, each kept in LRU order. The ghost lists b1 and b2 remember the
+# pages recently evicted from each, and a hit in a ghost list moves target, the size ARC aims
+# to give t1, towards whichever list would have kept that page. The lists are OrderedDicts
+# used as ordered sets, so every access is O(1).
+class ARC(Pager):
+    __slots__ = ('t1', 't2', 'b1', 'b2', 'target', 'mem_populated', 'pointer_to_populate', 'index_to_remove')
+
+    def __init__(self, num_frames):
+        Pager.__init__(self, num_frames)
+        self.t1 = OrderedDict()
+        self.t2 = OrderedDict()
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+        self.target = 0
+        self.mem_populated = False
+        self.pointer_to_populate = -1
+        self.index_to_remove = 0
+
+    def replace(self, in_b2):
+        """move the least recently used page of t1 or t2 to its ghost list, and
+           set index_to_remove to its frame."""
+        if self.t1 and (len(self.t1) > self.target or (in_b2 and len(self.t1) == self.target)):
+            page, _ = self.t1.popitem(last=False)
+            self.b1[page] = None
+        else:
+            page, _ = self.t2.popitem(last=False)
+            self.b2[page] = None
+        self.index_to_remove = self.page_table[page]
+
+    def access(self, address):
+        if address in self.t1:
+            del self.t1[address]
+            self.t2[address] = None
+        elif address in self.t2:
+            self.t2.move_to_end(address)
+        else:
+            self.admit(address)
+
+        return Pager.access(self, address)
+
+    def admit(self, address):
+        """update the lists for a fault on address, setting index_to_remove if a
+           page must be evicted to make room."""
+        # Memory is always full once either ghost list is non-empty, so every case that
+        # picks a victim below happens only when memory is full.
+        if address in self.b1:
+            self.target = min(self.num_frames, self.target + max(len(self.b2) // len(self.b1), 1))
+            self.replace(False)
+            del self.b1[address]
+            self.t2[address] = None
+        elif address in self.b2:
+            self.target = max(0, self.target - max(len(self.b1) // len(self.b2), 1))
+            self.replace(True)
+            del self.b2[address]
+            self.t2[address] = None
+        else:
+            in_t1_or_b1 = len(self.t1) + len(self.b1)
+            total = in_t1_or_b1 + len(self.t2) + len(self.b2)
+            if in_t1_or_b1 == self.num_frames:
+                if len(self.t1) < self.num_frames:
+                    self.b1.popitem(last=False)
+                    self.replace(False)
+                else:
+                    page, _ = self.t1.popitem(last=False)
+                    self.index_to_remove = self.page_table[page]
+            elif total >= self.num_frames:
+                if total == 2 * self.num_frames:
+                    self.b2.popitem(last=False)
+                self.replace(False)
+            self.t1[address] = None
+
+    def evict(self):
+        if not self.mem_populated:
+            self.pointer_to_populate += 1
+            if self.pointer_to_populate == (self.num_frames - 1):
+                self.mem_populated = True
+            return self.pointer_to_populate
+        else:
+            return self.index_to_remove
+
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        t1 = self.t1
+        t2 = self.t2
+        admit = self.admit
+        num_frames = self.num_frames
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            if page in t2:
+                t2.move_to_end(page)
+                continue
+            if page in t1:
+                del t1[page]
+                t2[page] = None
+                continue
+            faults += 1
+            admit(page)
+            if free < num_frames:
+                frame = free
+                free += 1
+            else:
+                frame = self.index_to_remove
+                page_table[frames[frame]] = EMPTY
+            frames[frame] = page
+            page_table[page] = frame
+        self.pointer_to_populate = free - 1
+        self.mem_populated = free == num_frames
+        self.page_faults = faults
+        return faults
+
+
+# CompactARC is ARC with its lists in arrays: t1 and t2 are SlotLists over the frames, b1 and
+# b2 are SlotLists over ghost slots, each holding a page number, and the page table entry of
+# a remembered page points at its ghost slot. It needs a fraction of ARC's memory per frame
+# and runs at about half its speed; make_pager picks it with compact=True.
+T1, T2 = 0, 1
+B1, B2 = 0, 1
+
+
+class CompactARC(Pager):
+    __slots__ = ('resident', 'level', 'ghosts', 'ghost_page', 'ghost_level', 'free_ghosts', 'target',
+                 'admit_to', 'mem_populated', 'pointer_to_populate', 'index_to_remove')
+
+    def __init__(self, num_frames):
+        Pager.__init__(self, num_frames)
+        self.resident = SlotLists(num_frames, 2)
+        self.level = bytearray(num_frames)
+        # |b1| + |b2| never exceeds the number of frames
+        self.ghosts = SlotLists(num_frames, 2)
+        self.ghost_page = array('q', [EMPTY]) * num_frames
+        self.ghost_level = bytearray(num_frames)
+        self.free_ghosts = array('q', range(num_frames - 1, -1, -1))
+        self.target = 0
+        self.admit_to = T1
+        self.mem_populated = False
+        self.pointer_to_populate = -1
+        self.index_to_remove = 0
+
+    def remember(self, which, page):
+        """add page to the end of ghost list which"""
+        slot = self.free_ghosts.pop()
+        self.ghost_page[slot] = page
+        self.ghost_level[slot] = which
+        self.ghosts.append(which, slot)
+        self.page_table[page] = GHOST - slot
+
+    def forget(self, slot):
+        """remove the page in ghost slot from its ghost list"""
+        self.ghosts.remove(self.ghost_level[slot], slot)
+        self.page_table[self.ghost_page[slot]] = EMPTY
+        self.free_ghosts.append(slot)
+
+    def replace(self, in_b2):
+        """move the least recently used page of t1 or t2 to its ghost list, and
+           set index_to_remove to its frame."""
+        t1_length = self.resident.lengths[T1]
+        if t1_length and (t1_length > self.target or (in_b2 and t1_length == self.target)):
+            frame = self.resident.pop_first(T1)
+            self.remember(B1, self.frames[frame])
+        else:
+            frame = self.resident.pop_first(T2)
+            self.remember(B2, self.frames[frame])
+        self.index_to_remove = frame
+
+    def hit(self, frame):
+        """a hit moves the frame to the end of t2, from t1 or within t2"""
+        if self.level[frame] == T1:
+            self.resident.remove(T1, frame)
+            self.resident.append(T2, frame)
+            self.level[frame] = T2
+        else:
+            self.resident.move_to_end(T2, frame)
+
+    def access(self, address):
+        frame = self.lookup(address)
+        if frame >= 0:
+            self.hit(frame)
+            return frame
+
+        self.admit(address, frame)
+        frame = Pager.access(self, address)
+        self.level[frame] = self.admit_to
+        self.resident.append(self.admit_to, frame)
+        return frame
+
+    def admit(self, address, entry):
+        """update the lists for a fault on address, whose page table entry is
+           entry.  Sets admit_to to the list the page joins, and index_to_remove
+           if a page must be evicted to make room."""
+        # Memory is always full once either ghost list is non-empty, so every case that
+        # picks a victim below happens only when memory is full.
+        t1_length, t2_length = self.resident.lengths
+        b1_length, b2_length = self.ghosts.lengths
+        if entry <= GHOST:
+            slot = GHOST - entry
+            if self.ghost_level[slot] == B1:
+                self.target = min(self.num_frames, self.target + max(b2_length // b1_length, 1))
+                self.forget(slot)
+                self.replace(False)
+            else:
+                self.target = max(0, self.target - max(b1_length // b2_length, 1))
+                self.forget(slot)
+                self.replace(True)
+            self.admit_to = T2
+        else:
+            in_t1_or_b1 = t1_length + b1_length
+            total = in_t1_or_b1 + t2_length + b2_length
+            if in_t1_or_b1 == self.num_frames:
+                if t1_length < self.num_frames:
+                    self.forget(self.ghosts.first(B1))
+                    self.replace(False)
+                else:
+                    self.index_to_remove = self.resident.pop_first(T1)
+            elif total >= self.num_frames:
+                if total == 2 * self.num_frames:
+                    self.forget(self.ghosts.first(B2))
+                self.replace(False)
+            self.admit_to = T1
+
+    def evict(self):
+        if not self.mem_populated:
+            self.pointer_to_populate += 1
+            if self.pointer_to_populate == (self.num_frames - 1):
+                self.mem_populated = True
+            return self.pointer_to_populate
+        else:
+            return self.index_to_remove
+
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        level = self.level
+        admit = self.admit
+        resident = self.resident
+        append = resident.append
+        lengths = resident.lengths
+        prev = resident.prev
+        succ = resident.next
+        num_frames = self.num_frames
+        t2_sentinel = num_frames + T2
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            frame = page_table[page]
+            if frame >= 0:
+                # a hit: move the frame to the end of t2, as hit does
+                if level[frame] == T1:
+                    level[frame] = T2
+                    lengths[T1] -= 1
+                    lengths[T2] += 1
+                before = prev[frame]
+                after = succ[frame]
+                succ[before] = after
+                prev[after] = before
+                tail = prev[t2_sentinel]
+                succ[tail] = frame
+                prev[frame] = tail
+                succ[frame] = t2_sentinel
+                prev[t2_sentinel] = frame
+                continue
+            faults += 1
+            admit(page, frame)
+            if free < num_frames:
+                frame = free
+                free += 1
+            else:
+                frame = self.index_to_remove
+                evictee = frames[frame]
+                if page_table[evictee] == frame:
+                    page_table[evictee] = EMPTY
+            frames[frame] = page
+            page_table[page] = frame
+            level[frame] = self.admit_to
+            append(self.admit_to, frame)
+        self.pointer_to_populate = free - 1
+        self.mem_populated = free == num_frames
+        self.page_faults = faults
+        return faults
+
+
+# 2Q (Johnson and Shasha) admits new pages into a1in, a small FIFO. Pages evicted from a1in are
+# remembered in the ghost FIFO a1out, and a page faulted in again while it is remembered goes
+# into am, an LRU holding the rest of memory. Pages touched only once never displace am.
+class TwoQ(Pager):
+    __slots__ = ('a1in', 'a1out', 'am', 'max_a1in', 'max_a1out', 'mem_populated', 'pointer_to_populate',
+                 'index_to_remove')
+
+    def __init__(self, num_frames):
+        Pager.__init__(self, num_frames)
+        self.a1in = OrderedDict()
+        self.a1out = OrderedDict()
+        self.am = OrderedDict()
+        self.max_a1in = max(1, num_frames // 4)
+        self.max_a1out = max(1, num_frames // 2)
+        self.mem_populated = False
+        self.pointer_to_populate = -1
+        self.index_to_remove = 0
+
+    def reclaim(self):
+        """choose the page to evict and set index_to_remove to its frame"""
+        if len(self.a1in) > self.max_a1in or not self.am:
+            page, _ = self.a1in.popitem(last=False)
+            self.a1out[page] = None
+            if len(self.a1out) > self.max_a1out:
+                self.a1out.popitem(last=False)
+        else:
+            page, _ = self.am.popitem(last=False)
+        self.index_to_remove = self.page_table[page]
+
+    def access(self, address):
+        if address in self.am:
+            self.am.move_to_end(address)
+        elif address not in self.a1in:
+            self.admit(address, self.mem_populated)
+
+        return Pager.access(self, address)
+
+    def admit(self, address, full):
+        """update the queues for a fault on address.  If memory is full, also pick
+           a page to evict and set index_to_remove to its frame."""
+        if full:
+            self.reclaim()
+        if address in self.a1out:
+            del self.a1out[address]
+            self.am[address] = None
+        else:
+            self.a1in[address] = None
+
+    def evict(self):
+        if not self.mem_populated:
+            self.pointer_to_populate += 1
+            if self.pointer_to_populate == (self.num_frames - 1):
+                self.mem_populated = True
+            return self.pointer_to_populate
+        else:
+            return self.index_to_remove
+
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        am = self.am
+        a1in = self.a1in
+        admit = self.admit
+        num_frames = self.num_frames
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            if page in am:
+                am.move_to_end(page)
+                continue
+            if page in a1in:
+                continue
+            faults += 1
+            if free < num_frames:
+                admit(page, False)
+                frame = free
+                free += 1
+            else:
+                admit(page, True)
+                frame = self.index_to_remove
+                page_table[frames[frame]] = EMPTY
+            frames[frame] = page
+            page_table[page] = frame
+        self.pointer_to_populate = free - 1
+        self.mem_populated = free == num_frames
+        self.page_faults = faults
+        return faults
+
+
+# CompactTwoQ is 2Q with its queues in arrays, as in CompactARC: a1in and am are SlotLists
+# over the frames and a1out is a SlotLists over ghost slots. make_pager picks it with
+# compact=True.
+A1IN, AM = 0, 1
+
+
+class CompactTwoQ(Pager):
+    __slots__ = ('resident', 'level', 'a1out', 'ghost_page', 'free_ghosts', 'max_a1in', 'max_a1out',
+                 'admit_to', 'mem_populated', 'pointer_to_populate', 'index_to_remove')
+
+    def __init__(self, num_frames):
+        Pager.__init__(self, num_frames)
+        self.max_a1in = max(1, num_frames // 4)
+        self.max_a1out = max(1, num_frames // 2)
+        self.resident = SlotLists(num_frames, 2)
+        self.level = bytearray(num_frames)
+        self.a1out = SlotLists(self.max_a1out)
+        self.ghost_page = array('q', [EMPTY]) * self.max_a1out
+        self.free_ghosts = array('q', range(self.max_a1out - 1, -1, -1))
+        self.admit_to = A1IN
+        self.mem_populated = False
+        self.pointer_to_populate = -1
+        self.index_to_remove = 0
+
+    def forget(self, slot):
+        """remove the page in ghost slot from a1out"""
+        self.a1out.remove(0, slot)
+        self.page_table[self.ghost_page[slot]] = EMPTY
+        self.free_ghosts.append(slot)
+
+    def reclaim(self):
+        """choose the page to evict and set index_to_remove to its frame"""
+        if self.resident.lengths[A1IN] > self.max_a1in or not self.resident.lengths[AM]:
+            frame = self.resident.pop_first(A1IN)
+            if self.a1out.lengths[0] == self.max_a1out:
+                self.forget(self.a1out.first(0))
+            slot = self.free_ghosts.pop()
+            page = self.frames[frame]
+            self.ghost_page[slot] = page
+            self.a1out.append(0, slot)
+            self.page_table[page] = GHOST - slot
+        else:
+            frame = self.resident.pop_first(AM)
+        self.index_to_remove = frame
+
+    def access(self, address):
+        frame = self.lookup(address)
+        if frame >= 0:
+            if self.level[frame] == AM:
+                self.resident.move_to_end(AM, frame)
+            return frame
+
+        self.admit(address, self.mem_populated)
+        frame = Pager.access(self, address)
+        self.level[frame] = self.admit_to
+        self.resident.append(self.admit_to, frame)
+        return frame
+
+    def admit(self, address, full):
+        """update the queues for a fault on address, setting admit_to to the
+           queue the page joins.  If memory is full, also pick a page to evict
+           and set index_to_remove to its frame."""
+        if full:
+            self.reclaim()
+        # read the entry after reclaim, which may have dropped address from a1out
+        entry = self.page_table[address]
+        if entry <= GHOST:
+            self.forget(GHOST - entry)
+            self.admit_to = AM
+        else:
+            self.admit_to = A1IN
+
+    def evict(self):
+        if not self.mem_populated:
+            self.pointer_to_populate += 1
+            if self.pointer_to_populate == (self.num_frames - 1):
+                self.mem_populated = True
+            return self.pointer_to_populate
+        else:
+            return self.index_to_remove
+
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        level = self.level
+        append = self.resident.append
+        prev = self.resident.prev
+        succ = self.resident.next
+        admit = self.admit
+        num_frames = self.num_frames
+        am_sentinel = num_frames + AM
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            frame = page_table[page]
+            if frame >= 0:
+                if level[frame] == AM:
+                    # move the frame to the end of am
+                    before = prev[frame]
+                    after = succ[frame]
+                    succ[before] = after
+                    prev[after] = before
+                    tail = prev[am_sentinel]
+                    succ[tail] = frame
+                    prev[frame] = tail
+                    succ[frame] = am_sentinel
+                    prev[am_sentinel] = frame
+                continue
+            faults += 1
+            if free < num_frames:
+                admit(page, False)
+                frame = free
+                free += 1
+            else:
+                admit(page, True)
+                frame = self.index_to_remove
+                evictee = frames[frame]
+                if page_table[evictee] == frame:
+                    page_table[evictee] = EMPTY
+            frames[frame] = page
+            page_table[page] = frame
+            level[frame] = self.admit_to
+            append(self.admit_to, frame)
+        self.pointer_to_populate = free - 1
+        self.mem_populated = free == num_frames
+        self.page_faults = faults
+        return faults
+
+
+def next_use_array(trace, next_use=None):
+    """return an array giving, for each position i in trace, the position of the
+       next access to the same page (or len(trace) if it is never accessed
+       again).  Computed in a single backward pass over the trace.  If next_use
+       is given it is filled in and returned instead of a new list."""
+    n = len(trace)
+    if next_use is None:
+        next_use = array('q', [n]) * n
+    last_seen = {}
+    for i in range(n - 1, -1, -1):
+        page = trace[i]
+        next_use[i] = last_seen.get(page, n)
+        last_seen[page] = i
+    return next_use
+
+
+# The resident pages are kept in a max-heap keyed by their next use, so an eviction costs
+# O(log frames) instead of a scan of every frame. Keys change on every hit, so rather than
+# updating entries in place I push a fresh entry and leave the old one behind; stale entries
+# are skipped when popped, and the heap is rebuilt from frame_next once they pile up.
+# Heap entries are single ints, -(next use << FRAME_BITS | frame), rather than tuples.
+FRAME_BITS = 32
+FRAME_MASK = (1 << FRAME_BITS) - 1
+
 
 class OPT(Pager):
-    def __init__(self, num_frames, trace):
+    __slots__ = ('trace_counter', 'mem_populated', 'pointer_to_populate', 'next_use', 'frame_next', 'heap')
+
+    def __init__(self, num_frames, trace, next_use=None):
         """trace is a list of addresses; the full trace of accesses that will be
-           performed"""
+           performed.  next_use may be given if next_use_array(trace) has
+           already been computed."""
         Pager.__init__(self, num_frames)
         self.trace_counter = -1
         self.mem_populated = False
         self.pointer_to_populate = -1
-        self.address_dict = {}
+        if next_use is None:
+            next_use = next_use_array(trace)
+        self.next_use = next_use
 
-        # Build dictionary of all trace values and occurences
-        for i, address in enumerate(trace):
-            if address in self.address_dict:
-                self.address_dict[address].append(i)
-            else:
-                self.address_dict[address] = deque()
-                self.address_dict[address].append(i)
+        # frame_next holds the next use of the page in each frame
+        self.frame_next = array('q', [0]) * num_frames
+        self.heap = []
 
     def access(self, address):
         self.trace_counter += 1
-        return Pager.access(self, address)
+        frame = Pager.access(self, address)
+
+        next_ind = self.next_use[self.trace_counter]
+        self.frame_next[frame] = next_ind
+        heapq.heappush(self.heap, -(next_ind << FRAME_BITS | frame))
+        if len(self.heap) > 2 * self.num_frames + 64:
+            self.heap = self.rebuilt_heap(self.pointer_to_populate + 1)
+        return frame
 
+    def rebuilt_heap(self, loaded):
+        """return a heap holding exactly one entry for each of the first loaded frames"""
+        frame_next = self.frame_next
+        heap = [-(frame_next[frame] << FRAME_BITS | frame) for frame in range(loaded)]
+        heapq.heapify(heap)
+        return heap
 
     def evict(self):
         if not self.mem_populated:
@@ -153,66 +1274,591 @@ class OPT(Pager):
             return self.pointer_to_populate
 
         else:
-            # Hash has been built.
+            # Pop until we find an entry that is still current for its frame
+            while True:
+                key = -heapq.heappop(self.heap)
+                frame = key & FRAME_MASK
+                if self.frame_next[frame] == key >> FRAME_BITS:
+                    return frame
+
+    def run(self, trace):
+        if not self.reserve_trace(trace):
+            return self.run_chunks(trace)
+        frames = self.frames
+        page_table = self.page_table
+        frame_next = self.frame_next
+        heap = self.heap
+        next_use = self.next_use
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        num_frames = self.num_frames
+        max_heap = 2 * num_frames + 64
+        t = self.trace_counter
+        free = self.pointer_to_populate + 1
+        faults = self.page_faults
+        for page in trace:
+            t += 1
+            frame = page_table[page]
+            if frame < 0:
+                faults += 1
+                if free < num_frames:
+                    frame = free
+                    free += 1
+                else:
+                    while True:
+                        key = -heappop(heap)
+                        frame = key & FRAME_MASK
+                        if frame_next[frame] == key >> FRAME_BITS:
+                            break
+                    page_table[frames[frame]] = EMPTY
+                frames[frame] = page
+                page_table[page] = frame
+
+            when = next_use[t]
+            frame_next[frame] = when
+            heappush(heap, -(when << FRAME_BITS | frame))
+            if len(heap) > max_heap:
+                heap[:] = self.rebuilt_heap(free)
+        self.trace_counter = t
+        self.pointer_to_populate = free - 1
+        self.mem_populated = free == num_frames
+        self.page_faults = faults
+        return faults
+
+
+ALGORITHMS = ["FIFO", "LRU", "Random", "OPT", "CLOCK", "ARC", "2Q"]
+
+
+def make_pager(algorithm, num_frames, trace=None, next_use=None, compact=False):
+    """return a new pager for the named algorithm.  OPT also needs the trace it
+       will be run on, or its precomputed next_use array.  compact picks the
+       array-backed LRU, ARC and 2Q, which need several times less memory per
+       frame but run at about half the speed; use it for very many frames."""
+    if algorithm == "LRU":
+        return CompactLRU(num_frames) if compact else LRU(num_frames)
+    elif algorithm == "FIFO":
+        return FIFO(num_frames)
+    elif algorithm == "Random":
+        return Random(num_frames)
+    elif algorithm == "OPT":
+        return OPT(num_frames, trace, next_use)
+    elif algorithm == "CLOCK":
+        return CLOCK(num_frames)
+    elif algorithm == "ARC":
+        return CompactARC(num_frames) if compact else ARC(num_frames)
+    elif algorithm == "2Q":
+        return CompactTwoQ(num_frames) if compact else TwoQ(num_frames)
+    raise ValueError("unknown algorithm %r" % algorithm)
+
+
+################################################################################
+# Fault curves for stack algorithms ###########################################
+################################################################################
+
+# LRU and OPT are stack algorithms: the pages held by a k frame memory are always a subset of
+# those held by a k+1 frame memory. So a single pass that records the depth at which each
+# access finds its page in the stack gives the fault count for every number of frames at once.
+# The histograms below count accesses by stack distance; hist[d] is the number of accesses
+# that hit in any memory of at least d frames, and hist[0] counts accesses that always fault.
+
+def lru_distance_histogram(trace):
+    """return the LRU stack distance histogram of trace.  The stack distance of
+       an access is one more than the number of distinct pages accessed since
+       the previous access to the same page.
+
+       A Fenwick tree over access times holds a 1 at the most recent access of
+       each page, so each distance is one prefix sum: O(len(trace) log len(trace))."""
+    n = len(trace)
+    tree = [0] * (n + 1)
+    last_seen = {}
+    hist = [0]
+
+    for t, page in enumerate(trace, 1):
+        s = last_seen.get(page)
+        if s is None:
+            hist[0] += 1
+        else:
+            # pages whose most recent access is after s
+            i = s
+            before = 0
+            while i > 0:
+                before += tree[i]
+                i -= i & -i
+            distance = len(last_seen) - before + 1
+            if distance >= len(hist):
+                hist.extend([0] * (distance + 1 - len(hist)))
+            hist[distance] += 1
+
+            i = s
+            while i <= n:
+                tree[i] -= 1
+                i += i & -i
 
-            # List of size num_frames. Each index is the next use of that address
-            # Each index is set to the max in case that address is not used again
-            next_use = [sys.maxsize] * self.num_frames
-            for i, address in enumerate(self.frames):
-                current_dq = self.address_dict[address]
+        i = t
+        while i <= n:
+            tree[i] += 1
+            i += i & -i
+        last_seen[page] = t
 
+    return hist
 
-                # Iterates through the queue and pops occurences less than the current trace position
-                while len(current_dq) > 0 and current_dq[0] <= self.trace_counter:
-                    current_dq.popleft()
 
-                if len(current_dq) > 0:
-                    next_use[i] = current_dq[0]
+def opt_distance_histogram(trace, max_frames, next_use=None):
+    """return the OPT stack distance histogram of trace, for memories of up to
+       max_frames frames.  Accesses deeper than max_frames are counted as faults.
 
-            # In the form (index in frames, next index of address use in trace)
-            ind_to_evict = (0,0)
-            for i, next_ind in enumerate(next_use):
-                if next_ind > ind_to_evict[1]:
-                    ind_to_evict = (i, next_ind)
-            return ind_to_evict[0]
+       This is Mattson's priority stack: the accessed page moves to the top, and
+       at each level down to its old position the page that will be needed
+       later is pushed further down.  Only the pages that are needed later than
+       everything above them actually move, so instead of comparing every level
+       a max segment tree over the next uses of the stack finds each of them in
+       O(log max_frames).  An access costs O(moves * log max_frames); the moves
+       are the prefix maxima above the accessed page, usually a few for a hit
+       and a few hundred for a fault deep in a large stack."""
+    if next_use is None:
+        next_use = next_use_array(trace)
+    # one spare leaf past the bottom of the stack keeps the search in bounds
+    size = 1
+    while size <= max_frames:
+        size *= 2
+    # tree[size + i] is the next use of the page at stack position i, and
+    # tree[i] is the larger of tree[2 * i] and tree[2 * i + 1]
+    tree = [-1] * (2 * size)
+    stack = [None] * max_frames
+    position = {}
+    depth = 0
+    hist = [0] * (max_frames + 1)
 
+    for t, page in enumerate(trace):
+        end = position.get(page)
+        if end is not None:
+            hist[end + 1] += 1
+        else:
+            hist[0] += 1
+            end = depth
+            if depth < max_frames:
+                depth += 1
+
+        carried = stack[0]
+        when = tree[size]
+        stack[0] = page
+        position[page] = 0
+        tree[size] = next_use[t]
+        moved = [size]
+        if end > 0:
+            # the leaves above the search are updated right away but their
+            # ancestors only after the walk: a stale ancestor is never larger
+            # than the next use being carried, so the search stays exact
+            lo = size + 1
+            while True:
+                # first leaf at or after lo that will be needed later than carried
+                i = lo
+                while tree[i] <= when:
+                    while i & 1:
+                        i >>= 1
+                    if i == 0:
+                        break
+                    i += 1
+                if i == 0:
+                    break
+                while i < size:
+                    i *= 2
+                    if tree[i] <= when:
+                        i += 1
+                j = i - size
+                if j >= end:
+                    break
+                other = stack[j]
+                stack[j] = carried
+                position[carried] = j
+                carried = other
+                tree[i], when = when, tree[i]
+                moved.append(i)
+                lo = i + 1
+            if end < max_frames:
+                stack[end] = carried
+                position[carried] = end
+                tree[size + end] = when
+                moved.append(size + end)
+            else:
+                del position[carried]
+
+        for i in moved:
+            i >>= 1
+            while i:
+                a = tree[2 * i]
+                b = tree[2 * i + 1]
+                m = a if a > b else b
+                if tree[i] == m:
+                    break
+                tree[i] = m
+                i >>= 1
+
+    return hist
+
+
+def fault_curve(hist, min_frames, max_frames):
+    """return a list of (num_frames, page_faults) pairs for every number of frames
+       in [min_frames, max_frames], given a stack distance histogram."""
+    faults = sum(hist)
+    curve = []
+    for d in range(1, max_frames + 1):
+        if d < len(hist):
+            faults -= hist[d]
+        if d >= min_frames:
+            curve.append((d, faults))
+    return curve
+
+
+################################################################################
+# Trace statistics cache ######################################################
+################################################################################
+
+# Derived data that every run would otherwise recompute from the raw trace is kept in a
+# sidecar directory next to the trace. Entries are keyed by the trace's name, a hash of its
+# contents and the page size, so editing a trace invalidates its entries automatically;
+# stale entries for the same trace are removed when new ones are written. The directory is
+# kept under a size limit by removing the least recently used entries.
+
+CACHE_DIR = ".pagecache"
+CACHE_LIMIT = 256 << 20
+
+
+def file_digest(path):
+    """return the SHA-1 hex digest of the contents of the file at path"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TraceCache(object):
+    """Cached page numbers, next-use array and LRU stack distance histogram for
+       the trace at path with the given page size.  Each is computed on first
+       use and read back from the sidecar cache on later runs."""
+
+    def __init__(self, path, page_size=1, limit=CACHE_LIMIT):
+        self.path = path
+        self.page_size = page_size
+        self.limit = limit
+        self.directory = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+        self.name = os.path.basename(path)
+        self.digest = file_digest(path)[:16]
+        self.key = "%s.%s.%i" % (self.name, self.digest, page_size)
+        self.loaded = {}
+
+    def pages(self):
+        return self.get("pages", lambda: array('q', open_trace(self.path, self.page_size)))
+
+    def next_use(self):
+        return self.get("next_use", lambda: next_use_array(self.pages(), array('q', bytes(8 * len(self.pages())))))
+
+    def lru_histogram(self):
+        return self.get("lru_hist", lambda: array('q', lru_distance_histogram(self.pages())))
+
+    # Every cached field is an array('q'), stored as its raw machine words.  Nothing
+    # read from the cache directory is ever unpickled or otherwise executed.
+
+    def get(self, field, compute):
+        """return field from memory, the cache directory, or by calling compute"""
+        if field in self.loaded:
+            return self.loaded[field]
+        entry = os.path.join(self.directory, "%s.%s" % (self.key, field))
+        try:
+            value = array('q')
+            with open(entry, 'rb') as f:
+                value.frombytes(f.read())
+            os.utime(entry)
+        except (OSError, ValueError):
+            value = compute()
+            self.store(entry, value)
+        self.loaded[field] = value
+        return value
+
+    def store(self, entry, value):
+        os.makedirs(self.directory, exist_ok=True)
+        partial = "%s.%i.tmp" % (entry, os.getpid())
+        with open(partial, 'wb') as f:
+            value.tofile(f)
+        os.replace(partial, entry)
+        self.prune()
+
+    def prune(self):
+        """remove entries for older versions of this trace, then the least recently
+           used entries until the directory is within the size limit.  Entries
+           are named <trace>.<digest>.<page size>.<field>, and only a different
+           digest makes an entry stale; other page sizes are kept."""
+        prefix = self.name + "."
+        entries = []
+        for filename in os.listdir(self.directory):
+            full = os.path.join(self.directory, filename)
+            try:
+                if filename.startswith(prefix):
+                    parts = filename[len(prefix):].split(".")
+                    if len(parts) == 3 and parts[0] != self.digest:
+                        os.remove(full)
+                        continue
+                stat = os.stat(full)
+            except FileNotFoundError:
+                # removed by another run sharing the cache
+                continue
+            entries.append((stat.st_mtime, stat.st_size, full))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.limit:
+                break
+            try:
+                os.remove(full)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+################################################################################
+# Instrumentation #############################################################
+################################################################################
+
+# PagerStats wraps a pager rather than hooking into it: a run that does not use it calls
+# pager.access directly and pays nothing for the instrumentation.
+
+class PagerStats(object):
+    """Records statistics about the accesses made through it to a pager.  Call
+       stats.access(addr) in place of pager.access(addr).
+
+       Every window accesses, a row is added to series holding the hit ratio,
+       faults and evictions within the window, the working set size (distinct
+       pages accessed in the window) and the simulation throughput.  reuse_hist
+       counts accesses by LRU stack distance in power of two buckets: bucket 0
+       holds first accesses, and bucket b holds distances in [2**(b-1), 2**b).
+       With per_page set, page_reuse keeps the same histogram for every page."""
+
+    FIELDS = ["accesses", "hit_ratio", "faults", "evictions", "working_set", "accesses_per_second"]
+
+    def __init__(self, pager, window=1000, per_page=False):
+        self.pager = pager
+        self.window = window
+        self.accesses = 0
+        self.evictions = 0
+        self.series = []
+        self.reuse_hist = [0]
+        self.page_reuse = {} if per_page else None
+
+        self.window_faults = 0
+        self.window_evictions = 0
+        self.window_pages = set()
+        self.window_start = time.perf_counter()
+        self.start = self.window_start
+
+        # A Fenwick tree over access times holding a 1 at the latest access of each page,
+        # as in lru_distance_histogram; it doubles in size when the run outgrows it.
+        self.tree = [0] * 1025
+        self.last_seen = {}
+
+    def access(self, address):
+        pager = self.pager
+        faults = pager.page_faults
+        frame = pager.access(address)
+        if pager.page_faults != faults:
+            self.window_faults += 1
+            # every pager fills its empty frames before it evicts anything
+            if pager.page_faults > pager.num_frames:
+                self.window_evictions += 1
+
+        self.accesses += 1
+        self.record_reuse(address)
+        self.window_pages.add(address)
+        if self.accesses % self.window == 0:
+            self.end_window()
+        return frame
+
+    def record_reuse(self, page):
+        t = self.accesses
+        tree = self.tree
+        if t >= len(tree):
+            tree = self.tree = [0] * (2 * len(tree) - 1)
+            for when in self.last_seen.values():
+                self.mark(when, 1)
+
+        s = self.last_seen.get(page)
+        if s is None:
+            bucket = 0
+        else:
+            i = s
+            before = 0
+            while i > 0:
+                before += tree[i]
+                i -= i & -i
+            bucket = (len(self.last_seen) - before + 1).bit_length()
+            self.mark(s, -1)
+        self.mark(t, 1)
+        self.last_seen[page] = t
+
+        if bucket >= len(self.reuse_hist):
+            self.reuse_hist.extend([0] * (bucket + 1 - len(self.reuse_hist)))
+        self.reuse_hist[bucket] += 1
+        if self.page_reuse is not None:
+            hist = self.page_reuse.setdefault(page, {})
+            hist[bucket] = hist.get(bucket, 0) + 1
+
+    def mark(self, i, delta):
+        tree = self.tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def end_window(self):
+        """close the current window and append its row to series"""
+        count = self.accesses - (self.series[-1]["accesses"] if self.series else 0)
+        if count == 0:
+            return
+        now = time.perf_counter()
+        self.series.append({
+            "accesses": self.accesses,
+            "hit_ratio": 1 - self.window_faults / count,
+            "faults": self.window_faults,
+            "evictions": self.window_evictions,
+            "working_set": len(self.window_pages),
+            "accesses_per_second": count / max(now - self.window_start, 1e-9),
+        })
+        self.evictions += self.window_evictions
+        self.window_faults = 0
+        self.window_evictions = 0
+        self.window_pages = set()
+        self.window_start = now
+
+    def summary(self):
+        """return the totals for the run so far"""
+        self.end_window()
+        elapsed = time.perf_counter() - self.start
+        return {
+            "accesses": self.accesses,
+            "page_faults": self.pager.page_faults,
+            "evictions": self.evictions,
+            "hit_ratio": 1 - self.pager.page_faults / self.accesses if self.accesses else 0.0,
+            "distinct_pages": len(self.last_seen),
+            "accesses_per_second": self.accesses / max(elapsed, 1e-9),
+        }
+
+    def write_json(self, f):
+        report = {
+            "summary": self.summary(),
+            "window": self.window,
+            "series": self.series,
+            "reuse_histogram": self.reuse_hist,
+        }
+        if self.page_reuse is not None:
+            report["page_reuse_histograms"] = {str(page): hist for page, hist in self.page_reuse.items()}
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+    def write_csv(self, f):
+        """write the time series, one row per window"""
+        self.end_window()
+        writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+        writer.writeheader()
+        writer.writerows(self.series)
 
 
 ################################################################################
 ## Command line parsing and main driver ########################################
 ################################################################################
 
+def frame_range(text):
+    """argparse type for MIN:MAX frame count ranges"""
+    try:
+        low, high = [int(part) for part in text.split(":")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected MIN:MAX, got %r" % text)
+    if not 1 <= low <= high:
+        raise argparse.ArgumentTypeError("expected 1 <= MIN <= MAX, got %r" % text)
+    return low, high
+
+
 if __name__ == '__main__':
-    import argparse
     print("main")
 
     parser = argparse.ArgumentParser(description="simulate various page replacement algorithms")
     parser.add_argument("-s", "--page-size", help="the number of pages",
                         type=int, default=10)
     parser.add_argument("-n", "--num-frames", help="the number of frames",
-                        type=int, required=True)
-    parser.add_argument("algorithm", choices=["FIFO", "LRU", "Random", "OPT"],
+                        type=int)
+    parser.add_argument("--sweep", metavar="MIN:MAX", type=frame_range,
+                        help="print the page faults for every number of frames in [MIN, MAX] (LRU and OPT only)")
+    parser.add_argument("--stream", action="store_true",
+                        help="simulate in bounded memory without loading the whole trace")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="record per-window statistics and write them to FILE (JSON if it ends in .json, otherwise CSV)")
+    parser.add_argument("--window", type=int, default=1000,
+                        help="the number of accesses per --stats window")
+    parser.add_argument("--per-page", action="store_true",
+                        help="include a reuse distance histogram for every page in JSON --stats output")
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse page numbers, next uses and stack distances cached next to the trace by earlier runs")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep the LRU, ARC and 2Q recency lists in arrays: several times less memory per frame, but about half the speed")
+    parser.add_argument("--checked", action="store_true",
+                        help="simulate one access at a time, checking that every access returns a frame holding its page")
+    parser.add_argument("algorithm", choices=ALGORITHMS,
                         help="the replacement strategy to use")
     parser.add_argument("trace",
-                        help="the sequence of addresses to access.  Should be a filename containing one address per line.",
-                        type=open)
+                        help="the sequence of addresses to access.  Should be a filename containing one address per line, or a binary trace written by convert_trace.py.  Use - to read a text trace from stdin.")
     args = parser.parse_args()
+    if args.sweep is None and args.num_frames is None:
+        parser.error("one of --num-frames or --sweep is required")
+    if args.sweep is not None and args.algorithm not in ("LRU", "OPT"):
+        parser.error("--sweep only supports the stack algorithms LRU and OPT")
+    if args.sweep is not None and args.stream:
+        parser.error("--sweep needs the whole trace and cannot be used with --stream")
+    if args.cache and (args.stream or args.trace == '-'):
+        parser.error("--cache needs a trace file and cannot be used with --stream or stdin")
 
-    trace = [int(int(line) / args.page_size) for line in args.trace.readlines()]
-    pager = None
-    if args.algorithm == "LRU":
-        pager = LRU(args.num_frames)
-    elif args.algorithm == "FIFO":
-        pager = FIFO(args.num_frames)
-    elif args.algorithm == "Random":
-        pager = Random(args.num_frames)
-    elif args.algorithm == "OPT":
-        pager = OPT(args.num_frames, trace)
-
-    for addr in trace:
-        frame = pager.access(addr)
-        assert (pager.frames[frame] == addr)
+    cache = None
+    next_use = None
+    if args.cache:
+        cache = TraceCache(args.trace, args.page_size)
+        trace = cache.pages()
+        if args.algorithm == "OPT":
+            next_use = cache.next_use()
+    elif args.stream and args.algorithm == "OPT":
+        trace, next_use = spool_trace(args.trace, args.page_size)
+    elif args.stream:
+        trace = iter_trace(args.trace, args.page_size)
+    else:
+        trace = open_trace(args.trace, args.page_size)
+
+    if args.sweep is not None:
+        min_frames, max_frames = args.sweep
+        if args.algorithm == "LRU":
+            hist = cache.lru_histogram() if cache else lru_distance_histogram(trace)
+        else:
+            hist = opt_distance_histogram(trace, max_frames, next_use)
+        print("frames page_faults")
+        for num_frames, faults in fault_curve(hist, min_frames, max_frames):
+            print("%i %i" % (num_frames, faults))
+        sys.exit(0)
+
+    pager = make_pager(args.algorithm, args.num_frames, trace, next_use, args.compact)
+    stats = None
+    if args.stats:
+        stats = PagerStats(pager, args.window, args.per_page)
+        for addr in trace:
+            frame = stats.access(addr)
+            if args.checked:
+                assert (pager.frames[frame] == addr)
+    elif args.checked:
+        pager.run_checked(trace)
+    else:
+        pager.run(trace)
 
     print("total page faults: %i" % pager.page_faults)
 
+    if stats is not None:
+        with open(args.stats, "w", newline="") as f:
+            if args.stats.endswith(".json"):
+                stats.write_json(f)
+            else:
+                stats.write_csv(f)
+
 # vim: ts=2 sw=2 ai et list
@@ -0,0 +1,145 @@
+"""Model a TLB and multi-level page table in front of the paging simulators.
+
+Every access first looks its page up in a set-associative TLB.  A TLB miss
+costs a page table walk of one memory reference per level; the number of
+levels follows from the address width, the page size and the number of bits
+each level translates.  Every access is then passed on to a Pager exactly as
+in paging.py, and when the pager evicts a page its TLB entry is shot down.
+
+The sweep reads the trace once and simulates every page size in turn, either
+with a fixed number of frames or with a fixed amount of physical memory, so the
+output shows how larger pages trade TLB reach against page faults."""
+
+from collections import OrderedDict
+import random
+import time
+
+import paging
+
+
+class TLB(object):
+    """A set-associative TLB of entries entries, ways per set.  policy chooses
+       the entry to replace within a set: LRU, FIFO or Random."""
+
+    POLICIES = ["LRU", "FIFO", "Random"]
+
+    def __init__(self, entries, ways, policy="LRU"):
+        if entries % ways != 0:
+            raise ValueError("TLB entries (%i) must be a multiple of the associativity (%i)" % (entries, ways))
+        self.ways = ways
+        self.num_sets = entries // ways
+        self.sets = [OrderedDict() for i in range(self.num_sets)]
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, page):
+        """return True if page is in the TLB, otherwise load it and return False"""
+        entries = self.sets[page % self.num_sets]
+        if page in entries:
+            self.hits += 1
+            if self.policy == "LRU":
+                entries.move_to_end(page)
+            return True
+
+        self.misses += 1
+        if len(entries) >= self.ways:
+            if self.policy == "Random":
+                del entries[random.choice(list(entries))]
+            else:
+                entries.popitem(last=False)
+        entries[page] = None
+        return False
+
+    def invalidate(self, page):
+        self.sets[page % self.num_sets].pop(page, None)
+
+
+def walk_levels(page_size, address_bits, level_bits):
+    """return the number of page table levels needed to translate address_bits
+       bit addresses with the given page size, when each level translates
+       level_bits bits of the page number."""
+    offset_bits = (page_size - 1).bit_length()
+    page_bits = max(address_bits - offset_bits, 1)
+    return -(-page_bits // level_bits)
+
+
+def simulate(addresses, page_size, num_frames, algorithm, tlb_entries, tlb_ways, tlb_policy):
+    """run addresses through a TLB and a pager and return (tlb, pager)"""
+    pages = paging.page_numbers(addresses, page_size)
+    tlb = TLB(tlb_entries, tlb_ways, tlb_policy)
+    pager = paging.make_pager(algorithm, num_frames, pages)
+    lookup = tlb.lookup
+    invalidate = tlb.invalidate
+    access = pager.access
+
+    # owner mirrors pager.frames, so that the page a fault evicted is known
+    owner = [None] * num_frames
+    faults = 0
+    for page in pages:
+        lookup(page)
+        frame = access(page)
+        if pager.page_faults != faults:
+            faults = pager.page_faults
+            evictee = owner[frame]
+            if evictee is not None:
+                invalidate(evictee)
+            owner[frame] = page
+    return tlb, pager
+
+
+def effective_access_time(tlb, pager, levels, tlb_time, memory_time, fault_time):
+    """return the mean access time: a TLB lookup and a memory reference for
+       every access, a walk of levels memory references for every TLB miss, and
+       fault_time for every page fault."""
+    accesses = tlb.hits + tlb.misses
+    miss_rate = tlb.misses / accesses
+    fault_rate = pager.page_faults / accesses
+    return tlb_time + memory_time + miss_rate * levels * memory_time + fault_rate * fault_time
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="simulate a TLB and page table walks in front of a pager")
+    parser.add_argument("-s", "--page-sizes", default="64,256,1024,4096",
+                        type=lambda text: [int(size) for size in text.split(",")],
+                        help="comma separated page sizes to sweep")
+    frames = parser.add_mutually_exclusive_group(required=True)
+    frames.add_argument("-n", "--num-frames", type=int, help="a fixed number of frames for every page size")
+    frames.add_argument("-m", "--memory", type=int,
+                        help="a fixed physical memory size; each page size gets memory // page size frames")
+    parser.add_argument("-a", "--algorithm", default="LRU", choices=paging.ALGORITHMS,
+                        help="the page replacement algorithm")
+    parser.add_argument("--tlb-entries", type=int, default=64, help="number of TLB entries")
+    parser.add_argument("--tlb-ways", type=int, default=4, help="TLB associativity")
+    parser.add_argument("--tlb-policy", choices=TLB.POLICIES, default="LRU", help="TLB replacement policy")
+    parser.add_argument("--address-bits", type=int, default=32, help="virtual address width")
+    parser.add_argument("--level-bits", type=int, default=10,
+                        help="page number bits translated per page table level")
+    parser.add_argument("--flat", action="store_true",
+                        help="charge a single memory reference per TLB miss instead of a multi-level walk")
+    parser.add_argument("--tlb-time", type=float, default=1.0, help="TLB lookup time (ns)")
+    parser.add_argument("--memory-time", type=float, default=100.0, help="memory reference time (ns)")
+    parser.add_argument("--fault-time", type=float, default=1e7, help="page fault service time (ns)")
+    parser.add_argument("trace", help="the trace file, in the text or binary format")
+    args = parser.parse_args()
+
+    random.seed(0)
+    addresses = paging.open_trace(args.trace)
+    print("%9s %7s %6s %9s %9s %9s %7s %7s %12s"
+          % ("page_size", "frames", "levels", "tlb_reach", "tlb_hit", "faults", "fault%", "secs", "eat_ns"))
+    for page_size in args.page_sizes:
+        num_frames = args.num_frames or max(1, args.memory // page_size)
+        levels = 1 if args.flat else walk_levels(page_size, args.address_bits, args.level_bits)
+        start = time.perf_counter()
+        tlb, pager = simulate(addresses, page_size, num_frames, args.algorithm,
+                              args.tlb_entries, args.tlb_ways, args.tlb_policy)
+        elapsed = time.perf_counter() - start
+        eat = effective_access_time(tlb, pager, levels, args.tlb_time, args.memory_time, args.fault_time)
+        print("%9i %7i %6i %9i %8.2f%% %9i %6.3f%% %7.2f %12.1f"
+              % (page_size, num_frames, levels, args.tlb_entries * page_size,
+                 100.0 * tlb.hits / len(addresses), pager.page_faults,
+                 100.0 * pager.page_faults / len(addresses), elapsed, eat))
+
+# vim: ts=2 sw=2 ai et list